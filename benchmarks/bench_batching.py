@@ -0,0 +1,88 @@
+"""Synthesis throughput across batch sizes, for a model that can batch.
+
+The model is the scripted stand-in, whose apply_tts_batch runs padded
+sentences through one forward pass. Sentences vary in length, as in real
+text; each batch size synthesizes all of them through Synthesizer.produce
+and its audio is checked against batch size 1, the one call per sentence
+loop. Padding is the share of the batched audio that is cut off again.
+Run from the repository root:
+
+    python -m benchmarks.bench_batching [--sentences N] [--batch-sizes N...] [--threads N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.bench_streaming import SENTENCE
+from benchmarks.stand_in import save_stand_in
+from synthesizer_interface.model_store import load_torchscript
+from synthesizer_interface.synthesis import Synthesizer, group_by_length, split_text
+
+WORDS = SENTENCE.rstrip('.').split()
+
+
+def make_text(sentences: int) -> str:
+    """Sentences of 2 to 20 words"""
+    rng = np.random.default_rng(0)
+    return ' '.join(' '.join(rng.choice(WORDS, rng.integers(2, 21))).capitalize() + '.' for _ in range(sentences))
+
+
+def padding(texts: list, batch_size: int) -> float:
+    """Share of the batched input that is padding"""
+    padded = sum(len(batch) * max(len(texts[i]) for i in batch) for batch in group_by_length(texts, batch_size))
+    return 1 - sum(map(len, texts)) / padded
+
+
+def run(synthesizer: Synthesizer, text: str, repeats: int) -> tuple:
+    """Best seconds for the whole text and seconds to its first chunk, and its audio"""
+    synthesizer.produce(text, 'baya')  # warm up, TorchScript optimizes on the first calls
+    best = first = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = synthesizer.chunks(text, 'baya')
+        audio = [next(chunks)]
+        first = min(first, time.perf_counter() - start)
+        audio.extend(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best, first, synthesizer.join(audio)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare synthesis throughput across batch sizes.")
+    parser.add_argument('--sentences', type=int, default=64)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=None, help="torch threads (default: torch's choice)")
+    parser.add_argument('--hidden', type=int, default=1024, help="stand-in hidden size")
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+    text = make_text(args.sentences)
+    texts = split_text(text)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'stand_in.pt')
+        save_stand_in(path, args.hidden)
+        model = load_torchscript(path, 'cpu')
+
+    print(f"{len(texts)} sentences of {min(map(len, texts))}-{max(map(len, texts))} characters, "
+          f"{torch.get_num_threads()} torch threads")
+    print(f"{'batch size':<12}{'sentences/s':>12}{'RTF':>8}{'speedup':>9}{'first, ms':>11}{'padding':>9}  same audio")
+    reference = base = None
+    for batch_size in args.batch_sizes:
+        synthesizer = Synthesizer(model, batch_size=batch_size)
+        elapsed, first, audio = run(synthesizer, text, args.repeats)
+        if reference is None:
+            reference, base = audio, elapsed
+        rtf = elapsed / (len(audio) / synthesizer.sample_rate)
+        print(f"{batch_size:<12}{len(texts) / elapsed:>12.1f}{rtf:>8.4f}{base / elapsed:>8.2f}x"
+              f"{first * 1000:>11.1f}{padding(texts, batch_size):>9.1%}  {np.array_equal(audio, reference)}")
+
+
+if __name__ == '__main__':
+    main()
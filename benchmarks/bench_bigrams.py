@@ -0,0 +1,86 @@
+"""Build time, memory and lookup latency of dict-of-Trie bigrams versus BigramStore.
+
+BigramStore is built in bulk, compacted once as the n-gram loaders do, and
+one insert at a time with auto-compaction, as user memory updates it.
+
+The bigram TSV is not part of the repository, so a synthetic corpus with a
+Zipf-like distribution of first words is drawn from the shipped unigrams.
+Run from the repository root:
+
+    python -m benchmarks.bench_bigrams [records]
+"""
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.bench_trie import DATA_DIR, time_per_call
+from synthesizer_interface.bigram_store import BigramStore
+from synthesizer_interface.trie import Trie
+
+
+def synthetic_bigrams(records: int, seed: int = 0) -> list:
+    with open(os.path.join(DATA_DIR, 'top_10_percent_1grams.tsv'), 'r', encoding='utf-8') as f:
+        words = [line.split('\t')[0] for line in f][1:]
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    firsts = rng.choices(words, weights=weights, k=records)
+    return [(word1, rng.choice(words), rng.randint(1, 10000)) for word1 in firsts]
+
+
+def build_tries(bigrams: list) -> dict:
+    tries = {}
+    for word1, word2, freq in bigrams:
+        if word1 not in tries:
+            tries[word1] = Trie()
+        tries[word1].insert(word2, freq)
+    return tries
+
+
+def build_store(bigrams: list, auto_compact: bool = False) -> BigramStore:
+    store = BigramStore(auto_compact=auto_compact)
+    for word1, word2, freq in bigrams:
+        store.insert(word1, word2, freq)
+    store.compact()
+    return store
+
+
+def measure(build, bigrams: list) -> tuple:
+    start = time.perf_counter()
+    result = build(bigrams)
+    build_time = time.perf_counter() - start
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = build(bigrams)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, build_time, memory
+
+
+def main(records: int = 500000):
+    bigrams = synthetic_bigrams(records)
+    queries = [(word1, prefix) for word1, _, _ in bigrams[:200] for prefix in ('', 'п', 'по')]
+
+    tries, tries_time, tries_memory = measure(build_tries, bigrams)
+    tries_lookup = time_per_call(
+        lambda: [tries[w].get_top_n_prefixed(p, 5) for w, p in queries if w in tries], 3) / len(queries)
+    del tries
+    store, store_time, store_memory = measure(build_store, bigrams)
+    store_lookup = time_per_call(lambda: [store.top_n(w, p, 5) for w, p in queries], 3) / len(queries)
+    del store
+    auto, auto_time, auto_memory = measure(lambda records: build_store(records, auto_compact=True), bigrams)
+    auto_lookup = time_per_call(lambda: [auto.top_n(w, p, 5) for w, p in queries], 3) / len(queries)
+
+    print(f"{records} records")
+    print(f"{'engine':<26}{'build, s':>10}{'memory, MB':>12}{'lookup, us':>12}")
+    print(f"{'dict of Trie':<26}{tries_time:>10.2f}{tries_memory / 2**20:>12.1f}{tries_lookup * 1e6:>12.2f}")
+    print(f"{'BigramStore, bulk':<26}{store_time:>10.2f}{store_memory / 2**20:>12.1f}{store_lookup * 1e6:>12.2f}")
+    print(f"{'BigramStore, auto-compact':<26}{auto_time:>10.2f}{auto_memory / 2**20:>12.1f}"
+          f"{auto_lookup * 1e6:>12.2f}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,107 @@
+"""Time and peak memory of saving long synthesized audio to a file.
+
+Compares joining all chunks and exporting them with pydub, as "Скачать"
+used to do, with AudioWriter encoding chunk by chunk. The audio is
+sentence-sized chunks of a tone with noise, which a thread hands over at
+a real-time factor of RTF, as pool workers synthesizing them would, so
+the time includes waiting for synthesis. pydub rows for formats other
+than WAV need ffmpeg and are skipped without it. Peak memory counts
+Python and NumPy allocations. Run from the repository root:
+
+    python -m benchmarks.bench_encoding [minutes of audio] [formats...]
+"""
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+from pydub import AudioSegment
+
+from synthesizer_interface.encoding import AudioWriter, soundfile_supports
+
+SAMPLE_RATE = 48000
+CHUNK_SECONDS = 4
+RTF = 0.05  # synthesis time per second of audio
+
+
+def make_chunks(minutes: float) -> list:
+    rng = np.random.default_rng(0)
+    t = np.arange(CHUNK_SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    tone = 8000 * np.sin(2 * np.pi * 220 * t)
+    count = int(minutes * 60 / CHUNK_SECONDS)
+    return [(tone + rng.normal(0, 500, len(t))).astype(np.int16) for _ in range(count)]
+
+
+def synthesized(chunks: list):
+    """Yield chunks as a synthesis thread produces them at RTF"""
+    ready = queue.Queue()
+
+    def produce():
+        for chunk in chunks:
+            time.sleep(RTF * len(chunk) / SAMPLE_RATE)
+            ready.put(chunk)
+        ready.put(None)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while (chunk := ready.get()) is not None:
+        yield chunk
+
+
+def save_pydub(path: str, chunks, audio_format: str):
+    audio_data = np.concatenate(list(chunks))
+    audio = AudioSegment(audio_data.tobytes(), frame_rate=SAMPLE_RATE, sample_width=2, channels=1)
+    if audio_format == 'mp3':
+        audio.export(path, format='mp3', bitrate='192k', parameters=['-q:a', '0'])
+    else:
+        audio.export(path, format=audio_format)
+
+
+def save_writer(path: str, chunks, audio_format: str):
+    with AudioWriter(path, SAMPLE_RATE, audio_format) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+
+def measure(save, path: str, chunks: list, audio_format: str) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    save(path, synthesized(chunks), audio_format)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(minutes: float = 5, *formats: str):
+    formats = formats or ('wav', 'mp3', 'flac')
+    chunks = make_chunks(minutes)
+    has_ffmpeg = shutil.which(AudioSegment.converter) is not None
+    print(f"{minutes:g} min of audio in {len(chunks)} chunks, {sum(c.nbytes for c in chunks) >> 20} MB of PCM, "
+          f"synthesized at RTF {RTF}, ffmpeg {'found' if has_ffmpeg else 'not found'}")
+    # Time left after the last chunk is synthesized, for the user to wait
+    synthesis = RTF * len(chunks) * CHUNK_SECONDS
+    print(f"{'format':<8}{'method':<14}{'time, s':>10}{'wait, s':>10}{'peak, MB':>10}{'file, MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for audio_format in formats:
+            methods = [('AudioWriter', save_writer)]
+            if audio_format == 'wav' or has_ffmpeg:
+                methods.insert(0, ('pydub', save_pydub))
+            for label, save in methods:
+                if label == 'AudioWriter' and audio_format != 'wav' and not soundfile_supports(audio_format):
+                    label = 'ffmpeg pipe'
+                    if not has_ffmpeg:
+                        continue
+                path = os.path.join(tmp_dir, f'{label}.{audio_format}')
+                elapsed, peak = measure(save, path, chunks, audio_format)
+                size = os.path.getsize(path)
+                print(f"{audio_format:<8}{label:<14}{elapsed:>10.2f}{elapsed - synthesis:>10.2f}"
+                      f"{peak / (1 << 20):>10.1f}{size / (1 << 20):>10.1f}")
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5, *sys.argv[2:])
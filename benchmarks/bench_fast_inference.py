@@ -0,0 +1,100 @@
+"""Real-time factor and accuracy of the fast inference modes against the float model.
+
+The model is the scripted stand-in, no network is needed. It is loaded
+both as a TorchScript file with its own apply_tts, as the torchscript
+loader returns it, and as the network of a Python wrapper, the way silero's
+package model holds it. Each variant synthesizes the same sentences
+through Synthesizer; accuracy is the SNR and largest difference of its
+16-bit audio against the float model's. Run from the repository root:
+
+    python -m benchmarks.bench_fast_inference [--threads N] [--sentences N] [--hidden N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.bench_streaming import SENTENCE
+from benchmarks.stand_in import load_packaged_stand_in, save_stand_in
+from benchmarks.suite import quiet
+from synthesizer_interface.fast_inference import optimize_model
+from synthesizer_interface.model_store import load_torchscript
+from synthesizer_interface.synthesis import Synthesizer
+
+# name: optimize_model arguments, None for the float model as loaded
+VARIANTS = {
+    'float': None,
+    'inference mode': {'quantize': False, 'freeze': False},
+    'frozen': {'quantize': False, 'freeze': True},
+    'int8': {'quantize': True, 'freeze': False},
+    'fast': {'quantize': True, 'freeze': True},
+}
+
+
+def run(model, sentences: list, repeats: int) -> tuple:
+    """Best real-time factor over repeats and the audio of every sentence"""
+    synthesizer = Synthesizer(model)
+    synthesizer.synthesize(sentences[0], 'baya')  # warm up, TorchScript optimizes on the first calls
+    synthesizer.synthesize(sentences[0], 'baya')
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        audio = [synthesizer.synthesize(text, 'baya') for text in sentences]
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed / (sum(len(a) for a in audio) / synthesizer.sample_rate))
+    return best, audio
+
+
+def accuracy(audio: list, reference: list) -> tuple:
+    """SNR in dB and largest difference in 16-bit steps, against the reference audio"""
+    audio = np.concatenate(audio).astype(np.float64)
+    reference = np.concatenate(reference).astype(np.float64)
+    noise = np.sum((audio - reference) ** 2)
+    snr = 10 * np.log10(np.sum(reference ** 2) / noise) if noise else float('inf')
+    return snr, int(np.max(np.abs(audio - reference)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the fast inference modes with the float model.")
+    parser.add_argument('--threads', type=int, default=None, help="torch threads (default: torch's choice)")
+    parser.add_argument('--sentences', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--hidden', type=int, default=1024, help="stand-in hidden size")
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+    sentences = [f'Предложение номер {i}: {SENTENCE}' for i in range(args.sentences)]
+    print(f"{args.sentences} sentences, {torch.get_num_threads()} torch threads, "
+          f"quantized engine {torch.backends.quantized.engine}")
+    print(f"{'model':<13}{'variant':<16}{'applied':<15}{'RTF':>8}{'speedup':>9}{'SNR, dB':>9}{'max diff':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'stand_in.pt')
+        save_stand_in(path, args.hidden)
+        loaders = {
+            'torchscript': lambda: load_torchscript(path, 'cpu'),
+            'package': lambda: load_packaged_stand_in(path),
+        }
+        for form, load in loaders.items():
+            reference = base_rtf = None
+            for variant, options in VARIANTS.items():
+                model = load()
+                applied = '-'
+                if options is not None:
+                    with quiet():
+                        model = optimize_model(model, **options)
+                    applied = ', '.join(model.applied) or '-'
+                rtf, audio = run(model, sentences, args.repeats)
+                if reference is None:
+                    reference, base_rtf = audio, rtf
+                snr, max_diff = accuracy(audio, reference)
+                print(f"{form:<13}{variant:<16}{applied:<15}{rtf:>8.4f}{base_rtf / rtf:>8.2f}x"
+                      f"{snr:>9.1f}{max_diff:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Import time of every entry point, checked against a budget.
+
+Each entry point is imported in a fresh interpreter under python -X importtime.
+Its cumulative import time must stay within its budget and it must not import
+the modules listed as too heavy for it: torch alone takes seconds, and is
+only imported to load the model. Exits with status 1 when an entry point is
+over budget or imports a module it must not. Run from the repository root:
+
+    python -m benchmarks.bench_imports [--repeat N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+AUDIO = ('torch', 'pydub', 'sounddevice', 'soundfile')
+# name: (module, budget in ms, modules it must not import)
+ENTRY_POINTS = {
+    'trie': ('synthesizer_interface.trie', 25, AUDIO + ('numpy', 'PyQt5')),
+    'suggestions': ('synthesizer_interface.word_suggestions', 100, AUDIO + ('numpy', 'PyQt5')),
+    'gui': ('synthesizer_interface.synthesizer_interface', 600, AUDIO),
+    'batch': ('synthesizer_interface.batch', 500, AUDIO + ('PyQt5',)),
+    'server': ('synthesizer_interface.server', 900, AUDIO + ('PyQt5',)),
+    'main': ('main', 25, AUDIO),
+}
+
+
+def import_time(module: str) -> tuple:
+    """Cumulative import time of module in ms and the top-level packages it imported"""
+    result = subprocess.run(
+        [sys.executable, *(f'-W{option}' for option in sys.warnoptions), '-X', 'importtime', '-c',
+         f'import {module}'],
+        cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    cumulative = None
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, total, name = line.split('|')
+        name = name.strip()
+        packages.add(name.split('.')[0])
+        if name == module:
+            cumulative = int(total) / 1000
+    return cumulative, packages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import time of every entry point.")
+    parser.add_argument('--repeat', type=int, default=3, help="keep the fastest of N imports")
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'entry point':<14}{'module':<46}{'ms':>8}{'budget':>8}  heavy imports")
+    for name, (module, budget, forbidden) in ENTRY_POINTS.items():
+        times = []
+        for _ in range(args.repeat):
+            elapsed, packages = import_time(module)
+            times.append(elapsed)
+        elapsed = min(times)
+        heavy = sorted(packages.intersection(forbidden))
+        over = elapsed > budget
+        failed |= over or bool(heavy)
+        print(f"{name:<14}{module:<46}{elapsed:>8.1f}{budget:>8}  {', '.join(heavy) or '-'}"
+              f"{'  OVER BUDGET' if over else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Model load time on a cold start (file not stored yet) and on a warm start.
+
+The real model is not downloaded: a TorchScript stand-in is saved to a
+temporary directory and "downloaded" through a file:// URL, so the cold
+start measures the copy into the store plus the load. Run from the
+repository root:
+
+    python -m benchmarks.bench_model_store [hidden size]
+"""
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+from benchmarks.stand_in import save_stand_in
+from synthesizer_interface.model_store import ModelStore
+
+
+def timed_load(store: ModelStore) -> float:
+    start = time.perf_counter()
+    model = store.load()
+    elapsed = time.perf_counter() - start
+    model.apply_tts(text='Привет')  # the model must be usable, not only loaded
+    return elapsed
+
+
+def main(hidden: int = 1024, repeat: int = 5):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = os.path.join(tmp_dir, 'stand_in.pt')
+        save_stand_in(source, hidden)
+        url = pathlib.Path(source).as_uri()
+        store = ModelStore(url, model_dir=os.path.join(tmp_dir, 'models'), loader='torchscript')
+
+        cold = timed_load(store)
+        warm = [timed_load(store) for _ in range(repeat)]
+        size = os.path.getsize(store.path)
+
+    print(f"stand-in model: {size / 2**20:.1f} MB")
+    print(f"cold start: {cold * 1e3:.1f} ms (copy into the store + load)")
+    print(f"warm start: {min(warm) * 1e3:.1f} ms best, {sum(warm) / repeat * 1e3:.1f} ms mean of {repeat}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
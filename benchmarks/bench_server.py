@@ -0,0 +1,124 @@
+"""Latency and throughput of the synthesis server under concurrent clients.
+
+Starts the server on localhost with the TorchScript stand-in model and
+sends /tts requests from many clients at once, without batching and with
+micro-batching. Half of each request is a sentence that all clients share,
+as with a greeting that every tool says. One WebSocket request checks the
+streamed audio, and a server with a tiny queue checks that excess requests
+are rejected. Run from the repository root:
+
+    python -m benchmarks.bench_server [clients] [requests per client]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+import torch
+from aiohttp import web
+
+from benchmarks.bench_streaming import SENTENCE
+from benchmarks.stand_in import save_stand_in
+from synthesizer_interface.server import SynthesisBatcher, SynthesisServer
+from synthesizer_interface.synthesis import Synthesizer
+
+
+async def serve(synthesizer, batcher) -> tuple:
+    runner = web.AppRunner(SynthesisServer(synthesizer, batcher).app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f'http://127.0.0.1:{port}'
+
+
+async def client(session, url: str, number: int, requests: int, latencies: list, failures: list):
+    for i in range(requests):
+        text = f'{SENTENCE} Клиент {number}, запрос {i}.'
+        start = time.perf_counter()
+        async with session.post(f'{url}/tts', json={'text': text}) as response:
+            await response.read()
+            if response.status != 200:
+                failures.append(response.status)
+                continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def load(synthesizer, label: str, clients: int, requests: int, **batching):
+    batcher = SynthesisBatcher(synthesizer, **batching)
+    runner, url = await serve(synthesizer, batcher)
+    latencies, failures = [], []
+    async with aiohttp.ClientSession() as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session, url, number, requests, latencies, failures)
+                               for number in range(clients)))
+        elapsed = time.perf_counter() - start
+    await runner.cleanup()
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<14}{len(latencies) / elapsed:>12.1f}{statistics.median(latencies) * 1000:>10.0f}"
+          f"{p95 * 1000:>10.0f}{batcher.chunks / max(batcher.batches, 1):>14.1f}{len(failures):>10}")
+
+
+async def check_websocket(synthesizer):
+    runner, url = await serve(synthesizer, SynthesisBatcher(synthesizer))
+    text = ' '.join([SENTENCE] * 3)
+    async with aiohttp.ClientSession() as session, session.ws_connect(f'{url}/ws') as ws:
+        await ws.send_json({'text': text})
+        header = await ws.receive_json()
+        start = time.perf_counter()
+        first = None
+        frames = []
+        async for message in ws:
+            if message.type == aiohttp.WSMsgType.BINARY:
+                first = first or time.perf_counter() - start
+                frames.append(np.frombuffer(message.data, dtype='<i2'))
+            elif message.json().get('done'):
+                break
+    await runner.cleanup()
+    streamed = np.concatenate(frames)
+    assert np.array_equal(streamed, np.concatenate(list(synthesizer.stream(text, 'baya')))), "streamed audio differs"
+    print(f"WebSocket: {header['chunks']} chunks, {len(streamed) / header['sample_rate']:.2f} s of audio, "
+          f"first chunk after {first * 1000:.0f} ms")
+
+
+async def check_backpressure(synthesizer, clients: int):
+    batcher = SynthesisBatcher(synthesizer, max_queue=4)
+    runner, url = await serve(synthesizer, batcher)
+    async with aiohttp.ClientSession() as session:
+        async def request(i):
+            async with session.post(f'{url}/tts', json={'text': f'{SENTENCE} Номер {i}.'}) as response:
+                await response.read()
+                return response.status
+        statuses = await asyncio.gather(*(request(i) for i in range(clients)))
+    await runner.cleanup()
+    print(f"Queue of 4 chunks, {clients} requests of 2 chunks: "
+          f"{statuses.count(200)} served, {statuses.count(503)} rejected with 503")
+
+
+async def run(clients: int, requests: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'stand_in.pt')
+        save_stand_in(path)
+        model = torch.jit.load(path)
+    synthesizer = Synthesizer(model)
+    synthesizer.synthesize(SENTENCE, 'baya')  # warm up
+
+    print(f"{clients} clients, {requests} requests each, 2 sentences per request")
+    print(f"{'batching':<14}{'requests/s':>12}{'p50, ms':>10}{'p95, ms':>10}{'chunks/batch':>14}{'failed':>10}")
+    await load(synthesizer, 'none', clients, requests, max_batch=1, max_wait=0)
+    await load(synthesizer, 'micro-batch', clients, requests)
+    await check_websocket(synthesizer)
+    await check_backpressure(synthesizer, clients)
+
+
+def main(clients: int = 16, requests: int = 10):
+    asyncio.run(run(clients, requests))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
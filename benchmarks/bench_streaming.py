@@ -0,0 +1,48 @@
+"""Time to first audio of sentence-chunked synthesis versus one call for the whole text.
+
+Uses the TorchScript stand-in model, so no audio device or download is
+needed. Run from the repository root:
+
+    python -m benchmarks.bench_streaming [sentences]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+from benchmarks.stand_in import save_stand_in
+from synthesizer_interface.synthesis import Synthesizer
+
+SENTENCE = 'Съешь же ещё этих мягких французских булок, да выпей чаю.'
+
+
+def main(sentences: int = 20):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'stand_in.pt')
+        save_stand_in(path)
+        model = torch.jit.load(path)
+    synthesizer = Synthesizer(model)
+    text = ' '.join([SENTENCE] * sentences)
+    synthesizer.synthesize(SENTENCE, 'baya')  # warm up
+
+    start = time.perf_counter()
+    synthesizer.synthesize(text, 'baya')
+    whole = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stream = synthesizer.stream(text, 'baya')
+    next(stream)
+    first = time.perf_counter() - start
+    for _ in stream:
+        pass
+    total = time.perf_counter() - start
+
+    print(f"{sentences} sentences, {len(text)} characters")
+    print(f"whole text:  first audio after {whole * 1e3:.1f} ms")
+    print(f"streaming:   first audio after {first * 1e3:.1f} ms, all chunks after {total * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
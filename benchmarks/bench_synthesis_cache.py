@@ -0,0 +1,51 @@
+"""Re-synthesis time after a one-word edit, with the sentence-level cache.
+
+Uses the TorchScript stand-in model and an in-memory cache. Run from the
+repository root:
+
+    python -m benchmarks.bench_synthesis_cache [sentences]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+from benchmarks.bench_streaming import SENTENCE
+from benchmarks.stand_in import save_stand_in
+from synthesizer_interface.synthesis import Synthesizer
+from synthesizer_interface.synthesis_cache import SynthesisCache
+
+
+def timed_produce(synthesizer: Synthesizer, text: str) -> float:
+    start = time.perf_counter()
+    synthesizer.produce(text, 'baya')
+    return time.perf_counter() - start
+
+
+def main(sentences: int = 20):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'stand_in.pt')
+        save_stand_in(path)
+        model = torch.jit.load(path)
+    synthesizer = Synthesizer(model, cache=SynthesisCache())
+    text = ' '.join(f'Предложение номер {i}: {SENTENCE}' for i in range(sentences))
+    edited = text.replace('булок', 'пирогов', 1)
+
+    uncached = Synthesizer(model)
+    uncached.synthesize(SENTENCE, 'baya')  # warm up
+    full = timed_produce(uncached, text)
+    first = timed_produce(synthesizer, text)
+    repeat = timed_produce(synthesizer, text)
+    edit = timed_produce(synthesizer, edited)
+
+    print(f"{sentences} sentences")
+    print(f"no cache:            {full * 1e3:.1f} ms")
+    print(f"first run:           {first * 1e3:.1f} ms")
+    print(f"same text again:     {repeat * 1e3:.1f} ms")
+    print(f"after one-word edit: {edit * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
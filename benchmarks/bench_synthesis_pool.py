@@ -0,0 +1,56 @@
+"""Synthesis throughput in sentences per second, in process and across pool sizes.
+
+Workers load the TorchScript stand-in model. Each pool size splits the
+cores evenly between workers. Run from the repository root:
+
+    python -m benchmarks.bench_synthesis_pool [sentences] [pool sizes...]
+"""
+import functools
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+from benchmarks.bench_streaming import SENTENCE
+from benchmarks.stand_in import save_stand_in
+from synthesizer_interface.model_store import load_torchscript
+from synthesizer_interface.synthesis import Synthesizer
+from synthesizer_interface.synthesis_pool import SynthesisPool
+
+
+def throughput(synthesizer: Synthesizer, text: str, sentences: int) -> float:
+    start = time.perf_counter()
+    synthesizer.produce(text, 'baya')
+    return sentences / (time.perf_counter() - start)
+
+
+def main(sentences: int = 40, *sizes: int):
+    sizes = sizes or (1, 2, 4)
+    text = ' '.join(f'Предложение номер {i}: {SENTENCE}' for i in range(sentences))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'stand_in.pt')
+        save_stand_in(path)
+        factory = functools.partial(load_torchscript, path, torch.device('cpu'))
+
+        in_process = Synthesizer(factory())
+        in_process.synthesize(SENTENCE, 'baya')  # warm up
+        print(f"{sentences} sentences, {os.cpu_count()} cores")
+        print(f"{'engine':<16}{'start, s':>10}{'sentences/s':>14}")
+        print(f"{'in process':<16}{'':>10}{throughput(in_process, text, sentences):>14.1f}")
+
+        for workers in sizes:
+            start = time.perf_counter()
+            pool = SynthesisPool(factory, workers=workers)
+            pool.start()
+            startup = time.perf_counter() - start
+            pooled = Synthesizer(None, pool=pool)
+            pooled.produce(SENTENCE, 'baya')  # warm up
+            label = f"pool of {workers}"
+            print(f"{label:<16}{startup:>10.2f}{throughput(pooled, text, sentences):>14.1f}")
+            pool.close()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
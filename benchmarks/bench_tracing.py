@@ -0,0 +1,66 @@
+"""Cost of tracing spans, while tracing is off and while it is on.
+
+Times an empty with block against one in a span, and get_suggestions
+over a replayed keystroke trace with tracing off and on. Run from the
+repository root:
+
+    python -m benchmarks.bench_tracing [spans]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.suite import APP_DIR, TRACE_TEXT, make_suggester, quiet
+from synthesizer_interface import tracing
+
+KEYSTROKES = [TRACE_TEXT[:end] for end in range(1, len(TRACE_TEXT) + 1)]
+
+
+def per_span(count: int) -> float:
+    """Seconds per span minus the loop's own time"""
+    start = time.perf_counter()
+    for _ in range(count):
+        pass
+    empty = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(count):
+        with tracing.span('bench'):
+            pass
+    return (time.perf_counter() - start - empty) / count
+
+
+def suggestions_time(suggester, rounds: int = 5) -> float:
+    """Mean seconds per get_suggestions call, the cache is cleared so every call looks up n-grams"""
+    best = float('inf')
+    for _ in range(rounds):
+        suggester.cache.clear()
+        start = time.perf_counter()
+        for text in KEYSTROKES:
+            suggester.get_suggestions(text, 5)
+        best = min(best, (time.perf_counter() - start) / len(KEYSTROKES))
+    return best
+
+
+def main(count: int = 1000000):
+    tracing.disable()
+    off = per_span(count)
+    tracing.enable(max_events=count)
+    on = per_span(count)
+    tracing.disable()
+    print(f"span while off: {off * 1e9:.0f} ns, while on: {on * 1e9:.0f} ns")
+
+    os.chdir(APP_DIR)
+    with tempfile.TemporaryDirectory() as tmp_dir, quiet():
+        suggester = make_suggester(tmp_dir)
+        off = suggestions_time(suggester)
+        tracing.enable()
+        on = suggestions_time(suggester)
+        tracing.disable()
+        suggester.user_memory.close()
+    print(f"get_suggestions while off: {off * 1e6:.1f} us, while on: {on * 1e6:.1f} us "
+          f"({(on - off) / off:+.1%})")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
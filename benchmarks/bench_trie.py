@@ -0,0 +1,63 @@
+"""Short-prefix latency of Trie.get_top_n_prefixed on the shipped unigrams.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_trie
+
+"full walk" is the previous lookup (collect the whole subtree and sort it),
+"top-k" is the per-node cache the trie keeps now.
+"""
+import os
+import time
+
+from synthesizer_interface.trie import Trie
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'synthesizer_interface', 'data')
+PREFIXES = ['п', 'с', 'в', 'по', 'пр', 'при', 'привет']
+
+
+def load_unigrams(trie: Trie):
+    with open(os.path.join(DATA_DIR, 'top_10_percent_1grams.tsv'), 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                word, freq = line.strip().split('\t')
+                trie.insert(word, int(freq))
+            except ValueError:
+                continue
+
+
+def full_walk(trie: Trie, prefix: str, n: int) -> list:
+    node = trie.root
+    for char in prefix.lower():
+        if char not in node.children:
+            return []
+        node = node.children[char]
+    words_freq = []
+    trie._collect_words(node, words_freq)
+    words_freq.sort(key=lambda x: x[1], reverse=True)
+    return [word for word, _ in words_freq[:n]]
+
+
+def time_per_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(n: int = 5):
+    trie = Trie()
+    start = time.perf_counter()
+    load_unigrams(trie)
+    print(f"Build: {time.perf_counter() - start:.2f} s")
+
+    print(f"{'prefix':<10}{'full walk, ms':>16}{'top-k, ms':>12}{'speedup':>10}")
+    for prefix in PREFIXES:
+        assert full_walk(trie, prefix, n) == trie.get_top_n_prefixed(prefix, n)
+        before = time_per_call(lambda: full_walk(trie, prefix, n), 5)
+        after = time_per_call(lambda: trie.get_top_n_prefixed(prefix, n), 10000)
+        print(f"{prefix:<10}{before * 1e3:>16.3f}{after * 1e3:>12.4f}{before / after:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
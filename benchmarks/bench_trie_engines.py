@@ -0,0 +1,39 @@
+"""Memory footprint and build time of the trie engines on the shipped unigrams.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_trie_engines
+"""
+import gc
+import time
+import tracemalloc
+
+from benchmarks.bench_trie import PREFIXES, load_unigrams, time_per_call
+from synthesizer_interface.trie import TRIE_ENGINES
+
+
+def main(n: int = 5):
+    print(f"{'engine':<10}{'build, s':>10}{'memory, MB':>12}{'lookup, us':>12}")
+    for name, trie_cls in TRIE_ENGINES.items():
+        start = time.perf_counter()
+        trie = trie_cls()
+        load_unigrams(trie)
+        build_time = time.perf_counter() - start
+        del trie
+
+        # tracemalloc slows the build down, so memory is measured on a second build
+        gc.collect()
+        tracemalloc.start()
+        trie = trie_cls()
+        load_unigrams(trie)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        lookup = sum(time_per_call(lambda: trie.get_top_n_prefixed(prefix, n), 2000)
+                     for prefix in PREFIXES) / len(PREFIXES)
+        print(f"{name:<10}{build_time:>10.2f}{memory / 2**20:>12.1f}{lookup * 1e6:>12.2f}")
+        del trie
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Time UserMemory.update_from_text over a 10k-sentence corpus.
+
+Sentences are drawn from the shipped unigrams with a Zipf-like
+distribution, so the user vocabulary keeps growing while common words
+repeat. The memory is written to a temporary directory. A flat per-sentence
+cost from the first thousand sentences to the last means learning does not
+depend on the history size. Run from the repository root:
+
+    python -m benchmarks.bench_user_memory [sentences]
+"""
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_trie import DATA_DIR
+from synthesizer_interface.user_memory import UserMemory
+
+
+def synthetic_sentences(count: int, seed: int = 0) -> list:
+    with open(os.path.join(DATA_DIR, 'top_10_percent_1grams.tsv'), 'r', encoding='utf-8') as f:
+        words = [line.split('\t')[0] for line in f][1:]
+    rng = random.Random(seed)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    return [' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(4, 16))) for _ in range(count)]
+
+
+def main(count: int = 10000):
+    sentences = synthetic_sentences(count)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        memory = UserMemory(os.path.join(tmp_dir, 'user_memory.json'))
+        times = []
+        for sentence in sentences:
+            start = time.perf_counter()
+            memory.update_from_text(sentence)
+            times.append(time.perf_counter() - start)
+        memory.close()
+        vocabulary = len(memory.unigram_counts)
+
+    window = min(1000, count)
+    ordered = sorted(times)
+    print(f"{count} sentences, {vocabulary} distinct words learned")
+    print(f"total:       {sum(times):.2f} s")
+    print(f"mean:        {sum(times) / count * 1e3:.3f} ms per sentence")
+    print(f"p99:         {ordered[int(count * 0.99) - 1] * 1e3:.3f} ms per sentence")
+    print(f"first {window}:  {sum(times[:window]) / window * 1e3:.3f} ms per sentence")
+    print(f"last {window}:   {sum(times[-window:]) / window * 1e3:.3f} ms per sentence")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,74 @@
+"""Small TorchScript stand-in for the silero TTS model.
+
+It has the same apply_tts signature and returns 60 ms of noise-like audio
+per character, so benchmarks can run without downloading the real model.
+apply_tts_batch synthesizes several texts in one forward pass, padded to
+the longest one. The hidden size sets the weight size: the default is
+about 20 MB, the real ru_v3 model is about 60 MB.
+"""
+from typing import List, Tuple
+
+import torch
+
+SAMPLES_PER_CHAR = 2880  # 60 ms at 48 kHz
+
+
+class StandIn(torch.nn.Module):
+    def __init__(self, hidden: int = 1024):
+        super().__init__()
+        self.embedding = torch.nn.Embedding(256, hidden)
+        self.layers = torch.nn.Sequential(
+            torch.nn.Linear(hidden, hidden), torch.nn.Tanh(),
+            torch.nn.Linear(hidden, hidden), torch.nn.Tanh())
+        self.output = torch.nn.Linear(hidden, SAMPLES_PER_CHAR)
+
+    def forward(self, chars: torch.Tensor) -> torch.Tensor:
+        # (..., chars) -> (..., chars * SAMPLES_PER_CHAR)
+        return torch.tanh(self.output(self.layers(self.embedding(chars)))).flatten(-2)
+
+    @torch.jit.export
+    def apply_tts(self, text: str, speaker: str = 'baya', sample_rate: int = 48000,
+                  put_accent: bool = True, put_yo: bool = True) -> torch.Tensor:
+        chars = torch.tensor([ord(char) % 256 for char in text], dtype=torch.long)
+        return self.forward(chars)
+
+    @torch.jit.export
+    def apply_tts_batch(self, texts: List[str], speaker: str = 'baya', sample_rate: int = 48000,
+                        put_accent: bool = True, put_yo: bool = True) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Audio of every text padded to the longest one, and the length of each"""
+        codes = [[ord(char) % 256 for char in text] for text in texts]
+        longest = max([len(text) for text in codes])
+        chars = torch.zeros((len(codes), longest), dtype=torch.long)
+        for i, text in enumerate(codes):
+            chars[i, :len(text)] = torch.tensor(text, dtype=torch.long)
+        lengths = torch.tensor([len(text) * self.output.out_features for text in codes], dtype=torch.long)
+        return self.forward(chars), lengths
+
+
+def save_stand_in(path: str, hidden: int = 1024):
+    """Script a stand-in model and save it to path"""
+    torch.jit.save(torch.jit.script(StandIn(hidden)), path)
+
+
+class PackagedStandIn:
+    """Like silero's package model: apply_tts in Python around a TorchScript network in .model"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def apply_tts(self, text: str, speaker: str = 'baya', sample_rate: int = 48000,
+                  put_accent: bool = True, put_yo: bool = True) -> torch.Tensor:
+        chars = torch.tensor([ord(char) % 256 for char in text], dtype=torch.long)
+        return self.model(chars)
+
+    def apply_tts_batch(self, texts: list, speaker: str = 'baya', sample_rate: int = 48000,
+                        put_accent: bool = True, put_yo: bool = True) -> tuple:
+        chars = torch.nn.utils.rnn.pad_sequence(
+            [torch.tensor([ord(char) % 256 for char in text], dtype=torch.long) for text in texts], batch_first=True)
+        lengths = torch.tensor([len(text) * SAMPLES_PER_CHAR for text in texts], dtype=torch.long)
+        return self.model(chars), lengths
+
+
+def load_packaged_stand_in(path: str) -> PackagedStandIn:
+    """Load a saved stand-in as the network of a PackagedStandIn"""
+    return PackagedStandIn(torch.jit.load(path))
@@ -0,0 +1,321 @@
+"""Repeatable benchmarks of the hot paths, with results as JSON.
+
+    python -m benchmarks.suite -o results.json
+    python -m benchmarks.suite -o new.json --compare results.json
+    python -m benchmarks.suite --scenario suggestion_latency --scenario synthesis
+
+Scenarios:
+    suggester_load       import, first and later WordSuggester() construction,
+                         and construction from the TSV files
+    suggestion_latency   get_suggestions over a replayed keystroke trace and
+                         over every one-letter prefix, with the cache cleared
+    user_memory          update_from_text and save_memory as history grows
+    synthesis            real-time factor and time to first audio of
+                         Synthesizer.produce with the seeded stand-in model
+
+Every scenario runs in a fresh Python process, so the first construction
+is cold for in-process caches (the OS file cache may still be warm) and
+peak RSS is the scenario's own. User memory is kept in a temporary
+directory. All metrics are costs, lower is better; --compare reports
+metrics that grew by more than --threshold and exits with status 1.
+On a noisy machine, --repeat keeps the lowest of several runs of each
+metric. Run from the repository root.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(REPO_ROOT, 'synthesizer_interface')  # get_data_dir() is relative to it
+
+# Typed keystroke by keystroke, so every prefix of every word is looked up
+TRACE_TEXT = ('Привет, как твои дела? Сегодня я хочу рассказать тебе о том, что случилось '
+              'вчера вечером. Мы пошли в парк и встретили там старого друга.')
+LETTERS = 'абвгдеёжзийклмнопрстуфхцчшщэюя'
+WARM_LOADS = 5
+TRACE_REPLAYS = 5
+MEMORY_CHECKPOINTS = (0, 1000, 5000, 20000)  # learned sentences
+MEMORY_SAMPLE = 200  # sentences timed at each checkpoint
+SAVE_REPEATS = 3
+SYNTHESIS_SENTENCES = 10
+SYNTHESIS_REPEATS = 5
+
+# Differences below these are noise, whatever the ratio
+NOISE_FLOOR = {'_ms': 0.05, '_s': 0.005, '_mb': 2.0, 'rtf': 0.002}
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, None where resource is not available"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Send the library's progress prints to devnull while timing"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def make_suggester(tmp_dir: str, use_index: bool = True):
+    from synthesizer_interface.word_suggestions import WordSuggester
+    return WordSuggester(use_index=use_index, memory_file=os.path.join(tmp_dir, 'user_memory.json'))
+
+
+def suggester_load(tmp_dir: str) -> dict:
+    os.chdir(APP_DIR)
+    start = time.perf_counter()
+    import synthesizer_interface.word_suggestions  # timed apart from construction
+    imported = time.perf_counter() - start
+
+    with quiet():
+        start = time.perf_counter()
+        make_suggester(tmp_dir)
+        cold = time.perf_counter() - start
+        warm = []
+        for _ in range(WARM_LOADS):
+            start = time.perf_counter()
+            make_suggester(tmp_dir)
+            warm.append(time.perf_counter() - start)
+        # The fallback when the n-gram index is missing or stale
+        start = time.perf_counter()
+        make_suggester(tmp_dir, use_index=False)
+        tsv = time.perf_counter() - start
+    return {
+        'import_ms': round(imported * 1e3, 1),
+        'cold_ms': round(cold * 1e3, 2),
+        'warm_ms': round(statistics.median(warm) * 1e3, 2),
+        'tsv_ms': round(tsv * 1e3, 1),
+    }
+
+
+def suggestion_latency(tmp_dir: str) -> dict:
+    os.chdir(APP_DIR)
+    with quiet():
+        suggester = make_suggester(tmp_dir)
+        trace = []
+        for _ in range(TRACE_REPLAYS):
+            suggester.cache.clear()
+            for end in range(1, len(TRACE_TEXT) + 1):
+                start = time.perf_counter()
+                suggester.get_suggestions(TRACE_TEXT[:end])
+                trace.append(time.perf_counter() - start)
+
+        # The widest lookups, first and after a word; nothing is cached
+        one_letter = []
+        for _ in range(TRACE_REPLAYS):
+            for text in [*LETTERS, *(f'и {letter}' for letter in LETTERS)]:
+                suggester.cache.clear()
+                start = time.perf_counter()
+                suggester.get_suggestions(text)
+                one_letter.append(time.perf_counter() - start)
+    return {
+        'trace_p50_ms': round(percentile(trace, 0.5) * 1e3, 3),
+        'trace_p99_ms': round(percentile(trace, 0.99) * 1e3, 3),
+        'one_letter_p50_ms': round(percentile(one_letter, 0.5) * 1e3, 3),
+        'one_letter_p99_ms': round(percentile(one_letter, 0.99) * 1e3, 3),
+    }
+
+
+def user_memory(tmp_dir: str) -> dict:
+    from benchmarks.bench_user_memory import synthetic_sentences
+    from synthesizer_interface.user_memory import UserMemory
+
+    sentences = synthetic_sentences(MEMORY_CHECKPOINTS[-1] + MEMORY_SAMPLE)
+    # No background compactions, they would land in the timed updates; saves are timed on their own
+    memory = UserMemory(os.path.join(tmp_dir, 'user_memory.json'), compact_after=len(sentences) + 1)
+    result = {}
+    learned = 0
+    for checkpoint in MEMORY_CHECKPOINTS:
+        for sentence in sentences[learned:checkpoint]:
+            memory.update_from_text(sentence)
+        sample = sentences[checkpoint:checkpoint + MEMORY_SAMPLE]
+        updates = []
+        for sentence in sample:
+            start = time.perf_counter()
+            memory.update_from_text(sentence)
+            updates.append(time.perf_counter() - start)
+        learned = checkpoint + len(sample)
+
+        # fsync makes single saves noisy
+        saves = []
+        for _ in range(SAVE_REPEATS):
+            start = time.perf_counter()
+            memory.save_memory()
+            saves.append(time.perf_counter() - start)
+        result[f'update_at_{checkpoint}_ms'] = round(statistics.median(updates) * 1e3, 3)
+        result[f'save_at_{checkpoint}_ms'] = round(min(saves) * 1e3, 2)
+    memory.close()
+    return result
+
+
+def synthesis(tmp_dir: str) -> dict:
+    import torch
+
+    from benchmarks.bench_streaming import SENTENCE
+    from benchmarks.stand_in import save_stand_in
+    from synthesizer_interface.synthesis import Synthesizer
+
+    torch.manual_seed(0)
+    torch.set_num_threads(1)  # the same on every machine
+    path = os.path.join(tmp_dir, 'stand_in.pt')
+    save_stand_in(path)
+    synthesizer = Synthesizer(torch.jit.load(path))
+    text = ' '.join(f'Предложение номер {i}: {SENTENCE}' for i in range(SYNTHESIS_SENTENCES))
+    synthesizer.produce(SENTENCE, 'baya')  # warm up
+
+    rtf = []
+    first_audio = []
+    for _ in range(SYNTHESIS_REPEATS):
+        start = time.perf_counter()
+        audio = synthesizer.produce(text, 'baya')
+        rtf.append((time.perf_counter() - start) / (len(audio) / synthesizer.sample_rate))
+
+        start = time.perf_counter()
+        stream = synthesizer.stream(text, 'baya')
+        next(stream)
+        first_audio.append(time.perf_counter() - start)
+        stream.close()
+    return {
+        'rtf': round(statistics.median(rtf), 4),
+        'first_audio_ms': round(statistics.median(first_audio) * 1e3, 2),
+    }
+
+
+SCENARIOS = {
+    'suggester_load': suggester_load,
+    'suggestion_latency': suggestion_latency,
+    'user_memory': user_memory,
+    'synthesis': synthesis,
+}
+
+
+def run_scenario(name: str, result_path: str):
+    """Run one scenario in this process and write its metrics to result_path"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        metrics = SCENARIOS[name](tmp_dir)
+        os.chdir(REPO_ROOT)  # leave tmp_dir removable on Windows
+    metrics['peak_rss_mb'] = peak_rss_mb()
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f)
+
+
+def run_isolated(name: str) -> dict:
+    """Run one scenario in a fresh Python process"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result_path = os.path.join(tmp_dir, 'result.json')
+        start = time.perf_counter()
+        warning_options = [f'-W{option}' for option in sys.warnoptions]
+        subprocess.run([sys.executable, *warning_options, '-m', 'benchmarks.suite', '--run-scenario', name,
+                        result_path], cwd=REPO_ROOT, check=True)
+        elapsed = time.perf_counter() - start
+        with open(result_path, 'r', encoding='utf-8') as f:
+            metrics = json.load(f)
+    print(f"{name}: {elapsed:.1f} s", file=sys.stderr)
+    return metrics
+
+
+def run_repeated(name: str, repeat: int) -> dict:
+    """Run a scenario repeat times and keep the lowest value of every metric"""
+    runs = [run_isolated(name) for _ in range(repeat)]
+    return {metric: min((run[metric] for run in runs if run[metric] is not None), default=None)
+            for metric in runs[0]}
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def is_noise(metric: str, old: float, new: float) -> bool:
+    for suffix, floor in NOISE_FLOOR.items():
+        if metric.endswith(suffix):
+            return abs(new - old) < floor
+    return False
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> list:
+    """Print every metric next to the baseline, return the regressed ones"""
+    regressions = []
+    print(f"{'metric':<46}{'baseline':>12}{'now':>12}{'change':>10}")
+    for name, metrics in results['scenarios'].items():
+        old_metrics = baseline.get('scenarios', {}).get(name, {})
+        for metric, new in metrics.items():
+            old = old_metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            regressed = change > threshold and not is_noise(metric, old, new)
+            label = f'{name}.{metric}'
+            print(f"{label:<46}{old:>12g}{new:>12g}{change:>+10.1%}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(label)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths and write the results as JSON.")
+    parser.add_argument('-o', '--output', help="write results to this file instead of stdout")
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help="run only this scenario, can be repeated")
+    parser.add_argument('--compare', metavar='BASELINE', help="results of an earlier run to compare with")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="run every scenario this many times and keep the lowest values, to cut noise")
+    parser.add_argument('--threshold', type=float, default=0.20, help="relative growth reported as a regression")
+    parser.add_argument('--run-scenario', nargs=2, metavar=('NAME', 'RESULT'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_scenario:
+        run_scenario(*args.run_scenario)
+        return 0
+
+    results = {
+        'meta': {**metadata(), 'repeat': args.repeat},
+        'scenarios': {name: run_repeated(name, args.repeat) for name in args.scenario or SCENARIOS},
+    }
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
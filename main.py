@@ -1,10 +1,8 @@
 import os
-import sounddevice as sou_voi
 import sys
 import time
-import torch
 
-from pydub import AudioSegment
+# torch, sounddevice and pydub are imported where they are used, they are slow to import
 
 language = 'ru'
 id_mode = 'ru_v3'
@@ -12,11 +10,12 @@ sample_rate = 48000  # 48000
 speaker = 'baya'  # aidar, baya, kseniya, xenia, random
 put_accent = True
 put_yo = True
-device = torch.device('cpu')  # cpu или gpu
+device = 'cpu'  # cpu или gpu
 text = "Хауди Хо, друзья!!!"
 
 
 def bib_model():
+    import torch
     model, _ = torch.hub.load(repo_or_dir='snakers4/silero-models', model='silero_tts', language=language, speaker=id_mode, verbose=False)
     return model
 
@@ -42,6 +41,9 @@ if __name__ == '__main__':
     if sys.stderr is None:
         sys.stderr = open(os.devnull, "w")
 
+    import sounddevice as sou_voi
+    from pydub import AudioSegment
+
     with open('output.txt', 'w') as f:
         sys.stdout = f
         sys.stderr = f
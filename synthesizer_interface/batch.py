@@ -0,0 +1,248 @@
+"""Synthesize text records to audio files without the GUI.
+
+    python -m synthesizer_interface.batch corpus.txt more.jsonl - --out-dir voiced --format mp3
+
+Text files and stdin ("-") give one record per non-empty line, or one per
+file with --whole-file. JSONL files give one record per object with a
+"text" and optional "id" and "speaker". Ids default to the file's path
+relative to the inputs' common directory, without the extension, and the
+line number; two records with the same id stop the run. The model is loaded once per
+process; with --workers it is loaded once per worker process and the
+chunks of up to --jobs records are synthesized at the same time. Models
+that can batch get the sentences of --batch-size records at a time,
+grouped by length.
+
+Every finished record is appended to manifest.jsonl in the output
+directory, and a rerun skips the records listed there. With
+SYNTHESIZER_TRACE=trace.json the timings of the run are written there.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from synthesizer_interface import tracing
+from synthesizer_interface.encoding import FORMATS, save_audio
+from synthesizer_interface.synthesis import BATCH_SIZE, Synthesizer, split_text
+from synthesizer_interface.synthesis_pool import default_workers, start_synthesizer
+
+MANIFEST_FILENAME = 'manifest.jsonl'
+
+
+class DuplicateRecordId(ValueError):
+    """Two records would be saved to the same files"""
+
+
+def read_records(paths: list, whole_file: bool = False):
+    """Yield (id, text, speaker or None) from text files, JSONL files and stdin"""
+    files = [os.path.abspath(path) for path in paths if path != '-']
+    # Files of the same name in different directories get different ids
+    root = os.path.commonpath([os.path.dirname(path) for path in files]) if files else ''
+    for path in paths:
+        if path == '-':
+            name, f = 'stdin', sys.stdin
+        else:
+            name = os.path.splitext(os.path.relpath(os.path.abspath(path), root))[0].replace(os.sep, '/')
+            f = open(path, 'r', encoding='utf-8')
+        try:
+            if path.endswith('.jsonl'):
+                for number, line in enumerate(f, 1):
+                    if line.strip():
+                        record = json.loads(line)
+                        yield str(record.get('id', f'{name}-{number}')), record['text'], record.get('speaker')
+            elif whole_file:
+                yield name, f.read(), None
+            else:
+                for number, line in enumerate(f, 1):
+                    if line.strip():
+                        yield f'{name}-{number}', line.strip(), None
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def read_manifest(path: str) -> set:
+    """Get the ids of records finished by earlier runs"""
+    done = set()
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)['id'])
+                except (ValueError, KeyError):
+                    continue  # A run stopped in the middle of writing the line
+    return done
+
+
+def file_stem(record_id: str) -> str:
+    return re.sub(r'[^\w.-]', '_', record_id)
+
+
+class BatchSynthesizer:
+    def __init__(self, synthesizer: Synthesizer, out_dir: str, audio_format: str = 'wav', per_chunk: bool = False,
+                 speaker: str = 'baya'):
+        self.synthesizer = synthesizer
+        self.out_dir = out_dir
+        self.audio_format = audio_format
+        self.per_chunk = per_chunk
+        self.speaker = speaker
+
+    def synthesize(self, record_id: str, text: str, speaker: str = None) -> dict:
+        """Synthesize one record into its file(s), return its manifest entry"""
+        start = time.perf_counter()
+        entry = self.save(record_id, self.synthesizer.chunks(text, speaker or self.speaker))
+        entry['seconds'] = round(time.perf_counter() - start, 3)
+        return entry
+
+    def synthesize_group(self, records: list) -> list:
+        """Synthesize records with their chunks batched together, return a manifest entry or exception each.
+
+        The group's time is shared between its records by audio length.
+        """
+        start = time.perf_counter()
+        records = [(record_id, split_text(text), speaker or self.speaker) for record_id, text, speaker in records]
+        audio = iter(self.synthesizer.synthesize_many(
+            [(chunk, speaker) for _, chunks, speaker in records for chunk in chunks]))
+        entries = []
+        for record_id, chunks, _ in records:
+            chunks = [next(audio) for _ in chunks]
+            error = next((chunk for chunk in chunks if isinstance(chunk, Exception)), None)
+            try:
+                if error is not None:
+                    raise error
+                entries.append(self.save(record_id, chunks))
+            except Exception as e:
+                entries.append(e)
+        elapsed = time.perf_counter() - start
+        total = sum(entry['audio_seconds'] for entry in entries if isinstance(entry, dict))
+        for entry in entries:
+            if isinstance(entry, dict):
+                entry['seconds'] = round(elapsed * entry['audio_seconds'] / total, 3) if total else 0.0
+        return entries
+
+    def save(self, record_id: str, chunks) -> dict:
+        """Write the audio of a record's chunks to its file(s), return its manifest entry without the time"""
+        stem = os.path.join(self.out_dir, file_stem(record_id))
+        sample_rate = self.synthesizer.sample_rate
+        files = []
+        samples = 0
+        if self.per_chunk:
+            for number, audio in enumerate(self.synthesizer.level(chunks), 1):
+                files.append(f'{stem}_{number:04d}.{self.audio_format}')
+                save_audio(files[-1], audio, sample_rate, self.audio_format)
+                samples += len(audio)
+        else:
+            audio = self.synthesizer.normalize(self.synthesizer.join(chunks))
+            files.append(f'{stem}.{self.audio_format}')
+            save_audio(files[-1], audio, sample_rate, self.audio_format)
+            samples = len(audio)
+        return {
+            'id': record_id,
+            'files': [os.path.basename(path) for path in files],
+            'audio_seconds': round(samples / sample_rate, 3),
+        }
+
+    def run(self, records, jobs: int = 1, group: int = 1) -> int:
+        """Synthesize records with up to jobs groups of them in flight, return the number synthesized"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        manifest_path = os.path.join(self.out_dir, MANIFEST_FILENAME)
+        done = read_manifest(manifest_path)
+        if os.path.exists(manifest_path) and os.path.getsize(manifest_path):
+            with open(manifest_path, 'rb+') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')  # Close the line a stopped run left unfinished
+        count = 0
+        with ThreadPoolExecutor(jobs) as executor, open(manifest_path, 'a', encoding='utf-8') as manifest:
+            in_flight = deque()
+            pending = []
+            stems = {}  # file stem -> id of the record saved under it in this run
+            for record in records:
+                stem = file_stem(record[0])
+                if stem in stems:
+                    raise DuplicateRecordId(f"Records {stems[stem]!r} and {record[0]!r} would both be saved as {stem}")
+                stems[stem] = record[0]
+                if record[0] in done:
+                    continue
+                pending.append(record)
+                if len(pending) < group:
+                    continue
+                in_flight.append(executor.submit(self._synthesize_records, pending))
+                pending = []
+                # Records are read lazily, at most jobs groups of them are held at a time
+                if len(in_flight) >= jobs:
+                    count += self._finish(in_flight.popleft(), manifest)
+            if pending:
+                in_flight.append(executor.submit(self._synthesize_records, pending))
+            while in_flight:
+                count += self._finish(in_flight.popleft(), manifest)
+        return count
+
+    def _synthesize_records(self, records: list) -> list:
+        if len(records) == 1:
+            return [self.synthesize(*records[0])]
+        return self.synthesize_group(records)
+
+    def _finish(self, future, manifest) -> int:
+        try:
+            entries = future.result()
+        except Exception as e:
+            print(f"Error synthesizing record: {e}")
+            return 0
+        count = 0
+        for entry in entries:
+            if isinstance(entry, Exception):
+                print(f"Error synthesizing record: {entry}")
+                continue
+            manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            manifest.flush()
+            real_time_factor = entry['seconds'] / entry['audio_seconds'] if entry['audio_seconds'] else 0
+            print(f"{entry['id']}: {entry['audio_seconds']:.2f} s of audio in {entry['seconds']:.2f} s "
+                  f"(RTF {real_time_factor:.2f})")
+            count += 1
+        return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthesize text records to audio files.")
+    parser.add_argument('inputs', nargs='+', help="text or .jsonl files, - for stdin")
+    parser.add_argument('--out-dir', default='voiced')
+    parser.add_argument('--format', choices=FORMATS, default='wav')
+    parser.add_argument('--speaker', default='baya', help="default speaker of records without one")
+    parser.add_argument('--sample-rate', type=int, default=48000)
+    parser.add_argument('--per-chunk', action='store_true', help="write a file for every sentence-sized chunk")
+    parser.add_argument('--whole-file', action='store_true', help="one record per text file instead of per line")
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help="synthesis worker processes, 0 to synthesize in this process")
+    parser.add_argument('--jobs', type=int, default=None, help="records in flight (default: 2 per worker)")
+    parser.add_argument('--threads', type=int, default=None, help="torch threads per worker")
+    parser.add_argument('--fast', action='store_true', help="quantized and frozen model, faster on CPU")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help="records, and sentences, synthesized together by models that can batch")
+    args = parser.parse_args(argv)
+    tracing.enable_from_env()
+
+    synthesizer, pool = start_synthesizer(args.workers, args.threads, args.sample_rate, fast=args.fast,
+                                          batch_size=args.batch_size)
+    # One model in this process is never called in parallel
+    jobs = (args.jobs or 2 * args.workers) if pool is not None else 1
+    group = args.batch_size if synthesizer.can_batch() else 1
+
+    batch = BatchSynthesizer(synthesizer, args.out_dir, args.format, args.per_chunk, args.speaker)
+    start = time.perf_counter()
+    try:
+        count = batch.run(read_records(args.inputs, args.whole_file), jobs, group)
+    except DuplicateRecordId as e:
+        sys.exit(f"{e}, give them unique ids")
+    finally:
+        if pool is not None:
+            pool.close()
+    print(f"{count} records synthesized in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
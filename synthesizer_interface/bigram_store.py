@@ -0,0 +1,229 @@
+"""Bigram frequencies kept in sorted arrays instead of one Trie per first word.
+
+Records are laid out in CSR form over word ids: the next words of word i
+are records start[i]:start[i + 1], sorted by next word id. Word ids follow
+the order of lowercase keys, so the next words starting with a prefix form
+one slice of those records and are found with two binary searches. First
+words with many next words also keep a precomputed top-k list.
+"""
+import bisect
+import heapq
+from array import array
+
+DEFAULT_TOP_K = 10
+SCAN_LIMIT = 64  # first words with more next words than this get a stored top-k list
+KEY_END = chr(0x10FFFF)  # sorts after every key with the same prefix
+
+
+def build_bigram_arrays(bigrams: dict, ids: dict, top_k: int = DEFAULT_TOP_K) -> tuple:
+    """Lay out key1 -> {key2: frequency} as (start, next_word, frequency, heavy, top) arrays.
+
+    ids maps every key to its word id; ids must follow key order.
+    """
+    start = array('I', [0])
+    next_word = array('i')
+    frequency = array('q')
+    heavy = array('i')
+    top = array('i')
+    by_id = {ids[key1]: next_words for key1, next_words in bigrams.items()}
+    for word_id in range(len(ids)):
+        next_words = by_id.get(word_id)
+        if next_words:
+            first = len(next_word)
+            for key2_id, key2 in sorted((ids[key2], key2) for key2 in next_words):
+                next_word.append(key2_id)
+                frequency.append(next_words[key2])
+            if len(next_words) > SCAN_LIMIT:
+                records = heapq.nsmallest(top_k, range(first, len(next_word)),
+                                          key=lambda r: (-frequency[r], r))
+                heavy.append(word_id)
+                top.extend([next_word[r] for r in records] + [-1] * (top_k - len(records)))
+        start.append(len(next_word))
+    return start, next_word, frequency, heavy, top
+
+
+class BigramLookup:
+    """Read-only queries over bigram arrays built by build_bigram_arrays.
+
+    Subclasses provide the word table (_find, _prefix_range, _word) and the
+    _start, _next_word, _frequency, _heavy and _top sequences.
+    """
+    top_k = DEFAULT_TOP_K
+
+    def _records(self, word_id: int, prefix: str) -> tuple:
+        start, end = self._start[word_id], self._start[word_id + 1]
+        if not prefix:
+            return start, end
+        lo, hi = self._prefix_range(prefix)
+        first = bisect.bisect_left(self._next_word, lo, start, end)
+        return first, bisect.bisect_left(self._next_word, hi, first, end)
+
+    def _stored_top(self, word_id: int, n: int):
+        slot = bisect.bisect_left(self._heavy, word_id)
+        if slot < len(self._heavy) and self._heavy[slot] == word_id:
+            base = slot * self.top_k
+            return [self._word(i) for i in self._top[base:base + n] if i != -1]
+        return None
+
+    def __contains__(self, word1: str) -> bool:
+        word_id = self._find(word1)
+        return word_id != -1 and self._start[word_id] < self._start[word_id + 1]
+
+    def top_n(self, word1: str, prefix: str, n: int) -> list:
+        """Get top n words by frequency following word1 that start with prefix"""
+        word_id = self._find(word1)
+        if word_id == -1:
+            return []
+        if not prefix and n <= self.top_k:
+            stored = self._stored_top(word_id, n)
+            if stored is not None:
+                return stored
+        first, last = self._records(word_id, prefix)
+        frequency = self._frequency
+        best = heapq.nsmallest(n, range(first, last), key=lambda r: (-frequency[r], r))
+        return [self._word(self._next_word[r]) for r in best]
+
+    def get_frequency(self, word1: str, word2: str) -> int:
+        """Get frequency of the bigram, 0 if it is not stored"""
+        word_id, next_id = self._find(word1), self._find(word2)
+        if word_id == -1 or next_id == -1:
+            return 0
+        start, end = self._start[word_id], self._start[word_id + 1]
+        record = bisect.bisect_left(self._next_word, next_id, start, end)
+        if record < end and self._next_word[record] == next_id:
+            return self._frequency[record]
+        return 0
+
+    def items(self, word1: str, prefix: str = ''):
+        """Yield (word2, frequency) for every word2 following word1 that starts with prefix"""
+        word_id = self._find(word1)
+        if word_id == -1:
+            return
+        first, last = self._records(word_id, prefix)
+        for r in range(first, last):
+            yield self._word(self._next_word[r]), self._frequency[r]
+
+
+class BigramStore(BigramLookup):
+    """Mutable bigram store.
+
+    insert() stages counts in a dict that every query reads on top of the
+    arrays, so an update costs a dict assignment. Staged counts are merged
+    into the arrays once they reach an eighth of the stored records (at
+    least COMPACT_MIN), which keeps the amortized cost of an insert
+    constant. Bulk loaders pass auto_compact=False and call compact() once.
+    Queries never modify the store.
+    """
+    COMPACT_MIN = 1024
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K, auto_compact: bool = True):
+        self.top_k = top_k
+        self.auto_compact = auto_compact
+        self._keys = []  # sorted lowercase keys, index is the word id
+        self._forms = []  # original word for each id
+        self._ids = {}  # key -> word id
+        self._start = array('I', [0])
+        self._next_word = array('i')
+        self._frequency = array('q')
+        self._heavy = array('i')
+        self._top = array('i')
+        self._pending = {}  # key1 -> {key2: frequency}, staged inserts
+        self._pending_forms = {}  # key -> original word of staged inserts
+        self._pending_count = 0
+
+    def insert(self, word1: str, word2: str, frequency: int):
+        key1, key2 = word1.lower(), word2.lower()
+        staged = self._pending.setdefault(key1, {})
+        if key2 not in staged:
+            self._pending_count += 1
+        staged[key2] = frequency
+        self._pending_forms[key1] = word1
+        self._pending_forms[key2] = word2
+        if self.auto_compact and self._pending_count >= max(self.COMPACT_MIN, len(self._next_word) // 8):
+            self.compact()
+
+    def get_frequency(self, word1: str, word2: str) -> int:
+        staged = self._pending.get(word1.lower())
+        if staged is not None and word2.lower() in staged:
+            return staged[word2.lower()]
+        return super().get_frequency(word1, word2)
+
+    def __contains__(self, word1: str) -> bool:
+        return word1.lower() in self._pending or super().__contains__(word1)
+
+    def _staged_form(self, key: str) -> str:
+        return self._pending_forms.get(key, key)
+
+    def top_n(self, word1: str, prefix: str, n: int) -> list:
+        """Get top n words by frequency following word1 that start with prefix"""
+        staged = self._pending.get(word1.lower())
+        if not staged:
+            return super().top_n(word1, prefix, n)
+
+        # Stored counts of staged words are outdated, so read enough records to skip them
+        prefix = prefix.lower()
+        candidates = []
+        word_id = self._find(word1)
+        if word_id != -1:
+            first, last = self._records(word_id, prefix)
+            frequency = self._frequency
+            for r in heapq.nsmallest(n + len(staged), range(first, last), key=lambda r: (-frequency[r], r)):
+                key2 = self._keys[self._next_word[r]]
+                if key2 not in staged:
+                    candidates.append((-frequency[r], key2, self._forms[self._next_word[r]]))
+        candidates.extend((-freq, key2, self._staged_form(key2))
+                          for key2, freq in staged.items() if key2.startswith(prefix))
+        return [form for _, _, form in heapq.nsmallest(n, candidates)]
+
+    def items(self, word1: str, prefix: str = ''):
+        """Yield (word2, frequency) for every word2 following word1 that starts with prefix"""
+        staged = self._pending.get(word1.lower(), {})
+        for word2, freq in super().items(word1, prefix):
+            if word2.lower() not in staged:
+                yield word2, freq
+        prefix = prefix.lower()
+        for key2, freq in staged.items():
+            if key2.startswith(prefix):
+                yield self._staged_form(key2), freq
+
+    def first_words(self):
+        """Yield every word that has at least one next word"""
+        for word_id, form in enumerate(self._forms):
+            if self._start[word_id] < self._start[word_id + 1] and self._keys[word_id] not in self._pending:
+                yield form
+        for key1 in self._pending:
+            yield self._staged_form(key1)
+
+    def compact(self):
+        """Merge staged inserts into the sorted arrays"""
+        if not self._pending:
+            return
+        bigrams = {}
+        for word_id, key1 in enumerate(self._keys):
+            start, end = self._start[word_id], self._start[word_id + 1]
+            if start < end:
+                bigrams[key1] = {self._keys[self._next_word[r]]: self._frequency[r] for r in range(start, end)}
+        for key1, next_words in self._pending.items():
+            bigrams.setdefault(key1, {}).update(next_words)
+
+        forms = dict(zip(self._keys, self._forms))
+        forms.update(self._pending_forms)
+        self._keys = sorted(forms)
+        self._forms = [forms[key] for key in self._keys]
+        self._ids = {key: i for i, key in enumerate(self._keys)}
+        self._start, self._next_word, self._frequency, self._heavy, self._top = \
+            build_bigram_arrays(bigrams, self._ids, self.top_k)
+        self._pending = {}
+        self._pending_forms = {}
+        self._pending_count = 0
+
+    def _find(self, word: str) -> int:
+        return self._ids.get(word.lower(), -1)
+
+    def _prefix_range(self, prefix: str) -> tuple:
+        prefix = prefix.lower()
+        lo = bisect.bisect_left(self._keys, prefix)
+        return lo, bisect.bisect_left(self._keys, prefix + KEY_END, lo)
+
+    def _word(self, word_id: int) -> str:
+        return self._forms[word_id]
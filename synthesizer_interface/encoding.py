@@ -0,0 +1,144 @@
+import functools
+import io
+import shutil
+import subprocess
+import threading
+import wave
+
+import numpy as np
+
+from synthesizer_interface import tracing
+
+FORMATS = ('wav', 'mp3', 'ogg', 'opus', 'flac')
+CONTENT_TYPES = {'wav': 'audio/wav', 'mp3': 'audio/mpeg', 'ogg': 'audio/ogg', 'opus': 'audio/ogg',
+                 'flac': 'audio/flac'}
+
+# libsndfile format, subtype and options, for encoding in this process
+SOUNDFILE_FORMATS = {
+    'mp3': ('MP3', 'MPEG_LAYER_III', {'bitrate_mode': 'VARIABLE', 'compression_level': 0.0}),  # as -q:a 0
+    'ogg': ('OGG', 'VORBIS', {}),
+    'opus': ('OGG', 'OPUS', {}),
+    'flac': ('FLAC', 'PCM_16', {}),
+}
+
+# ffmpeg output options, for the fallback when libsndfile cannot encode a format
+FFMPEG_FORMATS = {
+    'mp3': ['-f', 'mp3', '-b:a', '192k', '-q:a', '0'],
+    'ogg': ['-f', 'ogg', '-c:a', 'libvorbis'],
+    'opus': ['-f', 'ogg', '-c:a', 'libopus'],
+    'flac': ['-f', 'flac'],
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _soundfile():
+    """Import soundfile on first use, None if it is missing"""
+    try:
+        import soundfile
+    except (ImportError, OSError):  # OSError when the libsndfile library is missing
+        return None
+    return soundfile
+
+
+def soundfile_supports(audio_format: str) -> bool:
+    """Check if libsndfile can encode a format, older versions lack MP3 and Opus"""
+    soundfile = _soundfile()
+    if soundfile is None or audio_format not in SOUNDFILE_FORMATS:
+        return False
+    container, subtype, _ = SOUNDFILE_FORMATS[audio_format]
+    return container in soundfile.available_formats() and subtype in soundfile.available_subtypes(container)
+
+
+class AudioWriter:
+    """Writes mono 16-bit PCM to a file, or binary file object, chunk by chunk.
+
+    WAV is written with the wave module straight from the arrays' buffers.
+    The other formats are encoded in this process by libsndfile, through
+    soundfile, or without it by one ffmpeg process that reads the chunks
+    from a pipe. Chunks are encoded as they are written, so the whole
+    audio is never held in memory.
+    """
+
+    def __init__(self, path, sample_rate: int, audio_format: str = 'wav'):
+        if audio_format not in FORMATS:
+            raise ValueError(f"Unsupported audio format: {audio_format}")
+        self.sample_rate = sample_rate
+        self.audio_format = audio_format
+        self.frames = 0
+        self._wav = self._sound_file = self._ffmpeg = self._copier = None
+        if audio_format == 'wav':
+            self._wav = wave.open(path, 'wb')
+            self._wav.setnchannels(1)
+            self._wav.setsampwidth(2)
+            self._wav.setframerate(sample_rate)
+        elif soundfile_supports(audio_format):
+            container, subtype, options = SOUNDFILE_FORMATS[audio_format]
+            try:
+                self._sound_file = _soundfile().SoundFile(path, 'w', sample_rate, 1, subtype, format=container,
+                                                          **options)
+            except TypeError:
+                # soundfile before 0.13 has no MP3 options, libsndfile's default is VBR too
+                self._sound_file = _soundfile().SoundFile(path, 'w', sample_rate, 1, subtype, format=container)
+        else:
+            self._open_ffmpeg(path)
+
+    def _open_ffmpeg(self, path):
+        from pydub import AudioSegment  # only for the ffmpeg path that setup_env sets
+        converter = shutil.which(AudioSegment.converter) or AudioSegment.converter
+        to_file = isinstance(path, str)
+        self._ffmpeg = subprocess.Popen(
+            [converter, '-y', '-loglevel', 'error', '-f', 's16le', '-ar', str(self.sample_rate), '-ac', '1',
+             '-i', 'pipe:0', *FFMPEG_FORMATS[self.audio_format], path if to_file else 'pipe:1'],
+            stdin=subprocess.PIPE, stdout=None if to_file else subprocess.PIPE)
+        if not to_file:
+            # Read the output while writing the input, either pipe could fill up otherwise
+            self._copier = threading.Thread(target=shutil.copyfileobj, args=(self._ffmpeg.stdout, path),
+                                            name='ffmpeg-output', daemon=True)
+            self._copier.start()
+
+    def write(self, audio: np.ndarray):
+        # Copies only if audio is not contiguous little-endian int16 already
+        audio = np.ascontiguousarray(audio, dtype='<i2')
+        with tracing.span('encode', format=self.audio_format):
+            if self._wav is not None:
+                self._wav.writeframesraw(audio)
+            elif self._sound_file is not None:
+                self._sound_file.write(audio)
+            else:
+                self._ffmpeg.stdin.write(memoryview(audio).cast('B'))
+        self.frames += len(audio)
+
+    def close(self):
+        with tracing.span('encode.close', format=self.audio_format):
+            self._close()
+
+    def _close(self):
+        if self._wav is not None:
+            self._wav.close()  # Fills in the length in the header
+        elif self._sound_file is not None:
+            self._sound_file.close()
+        elif self._ffmpeg is not None:
+            self._ffmpeg.stdin.close()
+            if self._copier is not None:
+                self._copier.join()
+            if self._ffmpeg.wait():
+                raise RuntimeError(f"ffmpeg failed to encode {self.audio_format} with code {self._ffmpeg.returncode}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def save_audio(path, audio: np.ndarray, sample_rate: int, audio_format: str = 'wav'):
+    """Write mono 16-bit PCM to path, a file name or binary file"""
+    with AudioWriter(path, sample_rate, audio_format) as writer:
+        writer.write(audio)
+
+
+def encode_audio(audio: np.ndarray, sample_rate: int, audio_format: str = 'wav') -> bytes:
+    """Encode mono 16-bit PCM as the bytes of an audio file"""
+    f = io.BytesIO()
+    save_audio(f, audio, sample_rate, audio_format)
+    return f.getvalue()
@@ -0,0 +1,92 @@
+"""Faster CPU inference for the TTS model, at a small cost in accuracy.
+
+optimize_model applies what fits the model it is given:
+
+- a TorchScript network called through forward, such as the one inside
+  silero's package model: dynamic int8 quantization of its Linear and
+  LSTM layers in graph mode, then freezing and optimize_for_inference;
+- a TorchScript module with apply_tts of its own: freezing only, graph
+  mode quantization keeps forward alone and would drop apply_tts and
+  apply_tts_batch;
+- an eager torch.nn.Module: dynamic int8 quantization of its layers.
+
+The result runs under torch.inference_mode. Audio of a fast model differs
+from the float model's, so it is cached under its own model version.
+"""
+from synthesizer_interface.utils import setup_torch
+
+FAST_VERSION = ':fast'  # appended to the model version of cached audio
+
+
+class FastModel:
+    """Runs apply_tts of an optimized model under torch.inference_mode"""
+
+    def __init__(self, model, applied: list):
+        self.model = model
+        self.applied = applied  # the optimizations that were applied, for logs and benchmarks
+        self.inference_mode = setup_torch().inference_mode
+        if hasattr(model, 'apply_tts_batch'):
+            self.apply_tts_batch = self._apply_tts_batch  # Synthesizer batches only models that have it
+
+    def apply_tts(self, *args, **kwargs):
+        with self.inference_mode():
+            return self.model.apply_tts(*args, **kwargs)
+
+    def _apply_tts_batch(self, *args, **kwargs):
+        with self.inference_mode():
+            return self.model.apply_tts_batch(*args, **kwargs)
+
+
+def optimize_model(model, quantize: bool = True, freeze: bool = True) -> FastModel:
+    """Optimize a loaded model for CPU inference, see the module docstring"""
+    torch = setup_torch()
+    applied = []
+    if isinstance(model, torch.jit.ScriptModule):
+        methods = [name for name in ('apply_tts', 'apply_tts_batch') if hasattr(model, name)]
+        model = _optimize_script(model, quantize, freeze, applied, methods)
+    elif isinstance(model, torch.nn.Module):
+        model = _optimize_eager(model, quantize, applied)
+    elif isinstance(getattr(model, 'model', None), torch.nn.Module):
+        # silero's package model keeps its network in .model and calls it from Python
+        network = model.model
+        if isinstance(network, torch.jit.ScriptModule):
+            model.model = _optimize_script(network, quantize, freeze, applied, methods=[])
+        else:
+            model.model = _optimize_eager(network, quantize, applied)
+    print(f"Fast inference: {', '.join(applied) or 'inference mode only'}")
+    return FastModel(model, applied)
+
+
+def _optimize_eager(module, quantize: bool, applied: list):
+    torch = setup_torch()
+    module.eval()
+    module.requires_grad_(False)  # inference mode cannot save tensors for autograd
+    if quantize:
+        module = torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear, torch.nn.LSTM},
+                                                        dtype=torch.qint8)
+        applied.append('int8')
+    return module
+
+
+def _optimize_script(module, quantize: bool, freeze: bool, applied: list, methods: list):
+    """Optimize a TorchScript module that is called through forward and methods"""
+    torch = setup_torch()
+    module.eval()
+    for parameter in module.parameters():
+        parameter.requires_grad_(False)
+    # Graph mode quantization keeps forward only
+    if quantize and not methods:
+        try:
+            qconfig = torch.ao.quantization.default_dynamic_qconfig
+            module = torch.ao.quantization.quantize_dynamic_jit(module, {'': qconfig})
+            applied.append('int8')
+        except Exception as e:
+            print(f"Could not quantize the model: {e}")
+    if freeze:
+        try:
+            module = torch.jit.freeze(module.eval(), preserved_attrs=methods)
+            applied.append('frozen')
+            module = torch.jit.optimize_for_inference(module, other_methods=methods)
+        except Exception as e:
+            print(f"Could not freeze the model: {e}")
+    return module
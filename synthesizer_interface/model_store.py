@@ -0,0 +1,104 @@
+import os
+import shutil
+import urllib.parse
+import urllib.request
+import zipfile
+
+from synthesizer_interface.utils import get_model_dir, setup_torch
+
+# Package that torch.hub's silero_tts entry point downloads for language='ru', speaker='ru_v3'
+MODEL_URL = 'https://models.silero.ai/models/tts/ru/v3_1_ru.pt'
+
+
+def load_package(path: str, device: str):
+    """Load a silero model saved with torch.package"""
+    torch = setup_torch()
+    model = torch.package.PackageImporter(path).load_pickle('tts_models', 'model')
+    model.to(device)
+    return model
+
+
+def load_torchscript(path: str, device: str):
+    """Load a TorchScript model, its weights go straight to device"""
+    return setup_torch().jit.load(path, map_location=device)
+
+
+LOADERS = {
+    'package': load_package,
+    'torchscript': load_torchscript,
+}
+
+
+class ModelStore:
+    """TTS model kept as a file under get_model_dir().
+
+    The first start downloads the model file once. Later starts load it
+    straight from disk, without torch.hub resolving the repository or
+    looking up its cache, so they work offline. A stored file that is not
+    a whole archive is moved aside and downloaded again by fetch; an error
+    while loading the model never discards the file.
+    """
+
+    def __init__(self, url: str = MODEL_URL, model_dir: str = None, loader: str = 'package', device: str = 'cpu'):
+        self.url = url
+        self.model_dir = model_dir or get_model_dir()
+        self.path = os.path.join(self.model_dir, os.path.basename(urllib.parse.urlparse(url).path))
+        self.loader = LOADERS[loader]
+        self.device = device  # torch is imported only to load the model
+
+    def is_cached(self) -> bool:
+        return os.path.exists(self.path)
+
+    @property
+    def version(self) -> str:
+        """Identify the stored model file, for keys of cached audio"""
+        return f'{os.path.basename(self.path)}:{os.path.getsize(self.path)}'
+
+    def download(self):
+        """Download the model file, a partial download never replaces a good file"""
+        print(f"Downloading model from {self.url}...")
+        os.makedirs(self.model_dir, exist_ok=True)
+        tmp_path = self.path + '.part'
+        with urllib.request.urlopen(self.url) as response, open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(response, f, 1 << 20)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def is_intact(self) -> bool:
+        """Check that the stored file is a whole zip archive, as both model formats are"""
+        try:
+            with zipfile.ZipFile(self.path):
+                return True
+        except (zipfile.BadZipFile, OSError):
+            return False
+
+    def fetch(self):
+        """Make sure an intact model file is stored, downloading it if needed.
+
+        Called once by the parent process, before worker processes load the model.
+        """
+        if self.is_cached() and not self.is_intact():
+            print(f"Stored model {self.path} is damaged, downloading it again")
+            os.replace(self.path, self.path + '.bad')  # kept for inspection
+        if not self.is_cached():
+            self.download()
+
+    def load(self):
+        """Load the model from the local file, downloading it first if it is not stored"""
+        if not self.is_cached():
+            self.download()
+        print(f"Loading model from {self.path}")
+        return self.loader(self.path, self.device)
+
+
+def load_stored_model(fast: bool = False):
+    """Load the default model from the default store, usable as a worker process's model factory.
+
+    fast optimizes it with fast_inference.optimize_model.
+    """
+    model = ModelStore().load()
+    if fast:
+        from synthesizer_interface.fast_inference import optimize_model
+        model = optimize_model(model)
+    return model
@@ -0,0 +1,352 @@
+"""Prebuilt binary n-gram index, loaded with mmap instead of parsing the TSV files.
+
+Build it once after the TSV files change:
+
+    python -m synthesizer_interface.ngram_index [data_dir]
+
+The file holds a word table sorted by lowercase key, unigram frequencies,
+top-k lists for every prefix that matches many words, and bigram records
+grouped by the first word and sorted by the second word's id. Because ids
+follow key order, the words starting with a prefix form one id range, both
+in the word table and inside the bigram records of a word.
+"""
+import bisect
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from synthesizer_interface.bigram_store import KEY_END, SCAN_LIMIT, BigramLookup, build_bigram_arrays
+
+INDEX_FILENAME = 'ngrams.idx'
+UNIGRAMS_FILENAME = 'top_10_percent_1grams.tsv'
+BIGRAMS_FILENAME = 'top_10_percent_2grams.tsv'
+
+MAGIC = b'NGIX'
+VERSION = 1
+HEADER = struct.Struct('<4sII')  # magic, version, metadata length
+DEFAULT_TOP_K = 10
+
+
+def _align(offset: int) -> int:
+    return offset + -offset % 8
+
+
+def _source_stamp(path: str, with_hash: bool = True) -> dict:
+    stat = os.stat(path)
+    stamp = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        stamp['sha1'] = digest.hexdigest()
+    return stamp
+
+
+def _read_unigrams(path: str) -> dict:
+    """Parse the unigram TSV into key -> (word, freq), later lines win like in Trie"""
+    unigrams = {}
+    if not os.path.exists(path):
+        return unigrams
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                word, freq = line.strip().split('\t')
+                unigrams[word.lower()] = (word, int(freq))
+            except ValueError:
+                continue
+    return unigrams
+
+
+def _read_bigrams(path: str) -> dict:
+    """Parse the bigram TSV into key1 -> {key2: (word2, freq)}"""
+    bigrams = {}
+    if not os.path.exists(path):
+        return bigrams
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                words, freq = line.strip().split('\t')
+                words = words.split(' ')
+                if len(words) == 2:
+                    word1, word2 = words
+                    bigrams.setdefault(word1.lower(), {})[word2.lower()] = (word2, int(freq))
+            except ValueError:
+                continue
+    return bigrams
+
+
+def build_index(data_dir: str, index_path: str = None, top_k: int = DEFAULT_TOP_K) -> str:
+    """Compile the TSV files in data_dir into a binary index, return its path"""
+    index_path = index_path or os.path.join(data_dir, INDEX_FILENAME)
+    sources = {}
+    for filename in (UNIGRAMS_FILENAME, BIGRAMS_FILENAME):
+        path = os.path.join(data_dir, filename)
+        if os.path.exists(path):
+            sources[filename] = _source_stamp(path)
+
+    unigrams = _read_unigrams(os.path.join(data_dir, UNIGRAMS_FILENAME))
+    bigrams = _read_bigrams(os.path.join(data_dir, BIGRAMS_FILENAME))
+
+    # Word table: every key from both files, sorted
+    forms = {key: word for key, (word, _) in unigrams.items()}
+    for key1, next_words in bigrams.items():
+        forms.setdefault(key1, key1)
+        for key2, (word2, _) in next_words.items():
+            forms.setdefault(key2, word2)
+    keys = sorted(forms)
+    ids = {key: i for i, key in enumerate(keys)}
+
+    word_pool = bytearray()
+    word_offsets = array('I', [0])
+    for key in keys:
+        word_pool += forms[key].encode('utf-8')
+        word_offsets.append(len(word_pool))
+    unigram_freq = array('q', (unigrams[key][1] if key in unigrams else 0 for key in keys))
+
+    def top_ids(candidates, freq_of):
+        best = heapq.nsmallest(top_k, (i for i in candidates if freq_of(i) > 0), key=lambda i: (-freq_of(i), i))
+        return best + [-1] * (top_k - len(best))
+
+    # Stored top-k lists for prefixes matching more than SCAN_LIMIT words
+    prefix_counts = {}
+    for key in keys:
+        for length in range(1, len(key) + 1):
+            prefix = key[:length]
+            prefix_counts[prefix] = prefix_counts.get(prefix, 0) + 1
+    heavy = sorted([''] + [p for p, count in prefix_counts.items() if count > SCAN_LIMIT])
+    prefix_pool = bytearray()
+    prefix_offsets = array('I', [0])
+    prefix_top = array('i')
+    for prefix in heavy:
+        prefix_pool += prefix.encode('utf-8')
+        prefix_offsets.append(len(prefix_pool))
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + KEY_END)
+        prefix_top.extend(top_ids(range(lo, hi), unigram_freq.__getitem__))
+
+    # Bigram records in CSR layout, see bigram_store
+    bigram_start, bigram_word, bigram_freq, bigram_heavy, bigram_top = build_bigram_arrays(
+        {key1: {key2: freq for key2, (_, freq) in next_words.items()} for key1, next_words in bigrams.items()},
+        ids, top_k)
+
+    sections = [
+        ('word_offsets', word_offsets), ('word_pool', word_pool), ('unigram_freq', unigram_freq),
+        ('prefix_offsets', prefix_offsets), ('prefix_pool', prefix_pool), ('prefix_top', prefix_top),
+        ('bigram_start', bigram_start), ('bigram_word', bigram_word), ('bigram_freq', bigram_freq),
+        ('bigram_heavy', bigram_heavy), ('bigram_top', bigram_top),
+    ]
+    blobs = [bytes(data) for _, data in sections]
+    meta = {
+        'byteorder': sys.byteorder,
+        'top_k': top_k,
+        'words': len(keys),
+        'prefixes': len(heavy),
+        'bigrams': len(bigram_word),
+        'sources': sources,
+        'sections': {},
+    }
+    # Section offsets are relative to the 8-byte aligned end of the metadata
+    offset = 0
+    for (name, _), blob in zip(sections, blobs):
+        offset += -offset % 8
+        meta['sections'][name] = [offset, len(blob)]
+        offset += len(blob)
+    meta_bytes = json.dumps(meta).encode('utf-8')
+    data_start = _align(HEADER.size + len(meta_bytes))
+
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(meta_bytes)))
+        f.write(meta_bytes)
+        for (name, _), blob in zip(sections, blobs):
+            f.write(b'\0' * (data_start + meta['sections'][name][0] - f.tell()))
+            f.write(blob)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+class NgramIndex:
+    """Read-only view of an index file, answering queries straight from the mapping"""
+
+    def __init__(self, index_path: str):
+        with open(index_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"Unsupported index format in {index_path}")
+        self.meta = json.loads(self._mmap[HEADER.size:HEADER.size + meta_length])
+        if self.meta['byteorder'] != sys.byteorder:
+            self._mmap.close()
+            raise ValueError(f"Index {index_path} was built for another byte order")
+        self.top_k = self.meta['top_k']
+
+        self._view = memoryview(self._mmap)
+        data_start = _align(HEADER.size + meta_length)
+        def section(name, fmt=None):
+            offset, length = self.meta['sections'][name]
+            offset += data_start
+            data = self._view[offset:offset + length]
+            return data.cast(fmt) if fmt else data
+        self._word_offsets = section('word_offsets', 'I')
+        self._word_pool = section('word_pool')
+        self._unigram_freq = section('unigram_freq', 'q')
+        self._prefix_offsets = section('prefix_offsets', 'I')
+        self._prefix_pool = section('prefix_pool')
+        self._prefix_top = section('prefix_top', 'i')
+        self._bigram_start = section('bigram_start', 'I')
+        self._bigram_word = section('bigram_word', 'i')
+        self._bigram_freq = section('bigram_freq', 'q')
+        self._bigram_heavy = section('bigram_heavy', 'i')
+        self._bigram_top = section('bigram_top', 'i')
+        self._word_count = self.meta['words']
+
+        self.unigrams = IndexedUnigrams(self)
+        self.bigrams = IndexedBigrams(self)
+
+    @classmethod
+    def open(cls, data_dir: str):
+        """Open the index in data_dir, or return None if it is missing or stale"""
+        index_path = os.path.join(data_dir, INDEX_FILENAME)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            index = cls(index_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring n-gram index: {e}")
+            return None
+        if index.is_stale(data_dir):
+            print(f"N-gram index is out of date: {index_path}")
+            index.close()
+            return None
+        return index
+
+    def is_stale(self, data_dir: str) -> bool:
+        """Check the index against the TSV files it was built from.
+
+        Frozen builds may ship the index alone; missing sources are not stale.
+        The files are only hashed when size or mtime changed.
+        """
+        sources = self.meta['sources']
+        for filename in (UNIGRAMS_FILENAME, BIGRAMS_FILENAME):
+            path = os.path.join(data_dir, filename)
+            if not os.path.exists(path):
+                continue
+            if filename not in sources:
+                return True
+            stamp = _source_stamp(path, with_hash=False)
+            recorded = sources[filename]
+            if stamp['size'] != recorded['size']:
+                return True
+            if stamp['mtime_ns'] != recorded['mtime_ns'] and \
+                    _source_stamp(path)['sha1'] != recorded['sha1']:
+                return True
+        return False
+
+    def close(self):
+        for name in ('_word_offsets', '_word_pool', '_unigram_freq', '_prefix_offsets', '_prefix_pool',
+                     '_prefix_top', '_bigram_start', '_bigram_word', '_bigram_freq', '_bigram_heavy', '_bigram_top',
+                     '_view'):
+            getattr(self, name).release()
+        self._mmap.close()
+
+    def word(self, word_id: int) -> str:
+        return bytes(self._word_pool[self._word_offsets[word_id]:self._word_offsets[word_id + 1]]).decode('utf-8')
+
+    def _key(self, word_id: int) -> str:
+        return self.word(word_id).lower()
+
+    def _lower_bound(self, key: str, lo: int = 0) -> int:
+        hi = self._word_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, word: str) -> int:
+        """Get id of a word, -1 if it is not in the word table"""
+        key = word.lower()
+        word_id = self._lower_bound(key)
+        if word_id < self._word_count and self._key(word_id) == key:
+            return word_id
+        return -1
+
+    def prefix_range(self, prefix: str) -> tuple:
+        """Get the id range [lo, hi) of words starting with prefix"""
+        prefix = prefix.lower()
+        lo = self._lower_bound(prefix)
+        return lo, self._lower_bound(prefix + KEY_END, lo)
+
+    def _stored_prefix_top(self, prefix: str):
+        lo, hi = 0, len(self._prefix_offsets) - 1
+        encoded = prefix.encode('utf-8')
+        while lo < hi:
+            mid = (lo + hi) // 2
+            stored = bytes(self._prefix_pool[self._prefix_offsets[mid]:self._prefix_offsets[mid + 1]])
+            if stored.decode('utf-8') < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._prefix_offsets) - 1 and \
+                bytes(self._prefix_pool[self._prefix_offsets[lo]:self._prefix_offsets[lo + 1]]) == encoded:
+            return self._prefix_top[lo * self.top_k:(lo + 1) * self.top_k].tolist()
+        return None
+
+
+class IndexedUnigrams:
+    """Unigram part of an NgramIndex with the read-only Trie API"""
+
+    def __init__(self, index: NgramIndex):
+        self.index = index
+
+    def get_top_n_prefixed(self, prefix: str, n: int) -> list:
+        index = self.index
+        prefix = prefix.lower()
+        if n <= index.top_k:
+            stored = index._stored_prefix_top(prefix)
+            if stored is not None:
+                return [index.word(i) for i in stored[:n] if i != -1]
+        lo, hi = index.prefix_range(prefix)
+        freq = index._unigram_freq
+        best = heapq.nsmallest(n, (i for i in range(lo, hi) if freq[i] > 0), key=lambda i: (-freq[i], i))
+        return [index.word(i) for i in best]
+
+    def get_frequency(self, word: str) -> int:
+        word_id = self.index.find(word)
+        return self.index._unigram_freq[word_id] if word_id != -1 else 0
+
+    def items(self, prefix: str = ''):
+        index = self.index
+        lo, hi = index.prefix_range(prefix)
+        for i in range(lo, hi):
+            if index._unigram_freq[i] > 0:
+                yield index.word(i), index._unigram_freq[i]
+
+
+class IndexedBigrams(BigramLookup):
+    """Bigram part of an NgramIndex with the BigramStore query API"""
+
+    def __init__(self, index: NgramIndex):
+        self.top_k = index.top_k
+        self._find = index.find
+        self._prefix_range = index.prefix_range
+        self._word = index.word
+        self._start = index._bigram_start
+        self._next_word = index._bigram_word
+        self._frequency = index._bigram_freq
+        self._heavy = index._bigram_heavy
+        self._top = index._bigram_top
+
+
+if __name__ == '__main__':
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    print(f"Index written to: {build_index(data_dir)}")
@@ -0,0 +1,87 @@
+from collections import deque
+
+from PyQt5 import QtCore
+
+
+class PlaybackController(QtCore.QObject):
+    """Queue of utterances played one after another by a StreamPlayer.
+
+    Lives on the GUI thread and never blocks it: the player synthesizes and
+    plays on its own threads, and a timer polls it to report progress and
+    to start the next utterance when one ends.
+    """
+    started = QtCore.pyqtSignal(int)  # utterance id
+    progress = QtCore.pyqtSignal(int, float)  # utterance id, seconds played
+    finished = QtCore.pyqtSignal(int)  # utterance id, played to the end or stopped
+    state_changed = QtCore.pyqtSignal(str)  # 'playing', 'paused' or 'stopped'
+
+    def __init__(self, player, interval_ms: int = 100, parent=None):
+        super().__init__(parent)
+        self.player = player
+        self.pending = deque()  # (utterance id, chunks)
+        self.current = None
+        self.state = 'stopped'
+        self._next_id = 0
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._poll)
+
+    def enqueue(self, chunks) -> int:
+        """Play chunks after the queued utterances, return the utterance id"""
+        self._next_id += 1
+        self.pending.append((self._next_id, chunks))
+        if self.current is None:
+            self._start_next()
+        return self._next_id
+
+    def play(self, chunks) -> int:
+        """Stop everything queued and play chunks right away"""
+        self.stop()
+        return self.enqueue(chunks)
+
+    def pause(self):
+        if self.state == 'playing':
+            self.player.pause()
+            self._set_state('paused')
+
+    def resume(self):
+        if self.state == 'paused':
+            self.player.resume()
+            self._set_state('playing')
+
+    def stop(self):
+        """Stop the current utterance and drop the queued ones"""
+        self.pending.clear()
+        self.player.stop()
+        self._finish_current()
+        self.timer.stop()
+        self._set_state('stopped')
+
+    def _start_next(self):
+        if not self.pending:
+            self.timer.stop()
+            self._set_state('stopped')
+            return
+        self.current, chunks = self.pending.popleft()
+        self.player.play(chunks)
+        self.started.emit(self.current)
+        self.timer.start()
+        self._set_state('playing')
+
+    def _finish_current(self):
+        if self.current is not None:
+            utterance, self.current = self.current, None
+            self.finished.emit(utterance)
+
+    def _poll(self):
+        if self.current is None:
+            return
+        self.progress.emit(self.current, self.player.seconds_played())
+        if not self.player.is_playing():
+            self._finish_current()
+            self._start_next()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            self.state_changed.emit(state)
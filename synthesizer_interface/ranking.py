@@ -0,0 +1,62 @@
+import heapq
+import math
+
+
+def top_stream(fetch, get_frequency, start: int = 5):
+    """Yield (word, frequency) best first from fetch(n), a top-n query.
+
+    fetch is asked for start words and then for twice as many each time
+    the previous answer is used up, so a consumer that stops early never
+    makes the source collect all of its words.
+    """
+    n = start
+    yielded = set()
+    while True:
+        words = fetch(n)
+        for word in words:
+            if word not in yielded:
+                yielded.add(word)
+                yield word, get_frequency(word)
+        if len(words) < n:
+            return
+        n *= 2
+
+
+class Ranker:
+    """Merges frequency-ranked suggestion streams into one top-n list.
+
+    A candidate scores boost + weight * log1p(frequency), where boost and
+    weight belong to its source, so each stream stays sorted by score and a
+    heap over the stream heads yields candidates best first. Merging stops
+    as soon as n distinct words are found. Equal scores keep source order,
+    then stream order, so the result is deterministic.
+    """
+
+    def __init__(self, user_boost: float = 100.0, bigram_weight: float = 1.0, unigram_weight: float = 0.5):
+        self.user_boost = user_boost  # added to user memory scores, keeps the user's words first
+        self.bigram_weight = bigram_weight
+        self.unigram_weight = unigram_weight
+
+    def merge(self, sources: list, n: int) -> list:
+        """Get top n distinct words from sources, a list of (stream, weight, boost)"""
+        heap = []
+        for index, (stream, weight, boost) in enumerate(sources):
+            self._push(heap, index, 0, iter(stream), weight, boost)
+
+        result = []
+        seen = set()
+        while heap and len(result) < n:
+            _, index, position, word, stream, weight, boost = heapq.heappop(heap)
+            key = word.lower()
+            if key not in seen:
+                seen.add(key)
+                result.append(word)
+            self._push(heap, index, position + 1, stream, weight, boost)
+        return result
+
+    def _push(self, heap: list, index: int, position: int, stream, weight: float, boost: float):
+        item = next(stream, None)
+        if item is not None:
+            word, frequency = item
+            score = boost + weight * math.log1p(frequency)
+            heapq.heappush(heap, (-score, index, position, word, stream, weight, boost))
@@ -0,0 +1,324 @@
+"""Local HTTP and WebSocket server for synthesis and word suggestions.
+
+    python -m synthesizer_interface.server --port 8765 --workers 2
+
+    GET/POST /tts      text, speaker, format (wav, mp3, ogg) -> audio file
+    GET /ws            WebSocket: send {"text": ..., "speaker": ...} and receive
+                       {"sample_rate": ..., "chunks": ...}, binary 16-bit PCM
+                       chunks with pauses between them, then {"done": true}
+    GET /suggest       text, n, cursor -> {"suggestions": [...]}
+    GET /stats         tracing spans and counters, batcher and cache counts
+
+POST takes a JSON object, GET takes query parameters. The model is loaded
+once for the server, and the chunks of all requests go through one
+SynthesisBatcher. When its queue is full, /tts answers 503 and the
+WebSocket sends {"error": ...}. Set SYNTHESIZER_TRACE to fill /stats,
+see synthesizer_interface.tracing.
+"""
+import argparse
+import asyncio
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from synthesizer_interface import tracing
+from synthesizer_interface.encoding import CONTENT_TYPES, FORMATS, encode_audio
+from synthesizer_interface.synthesis import Leveler, split_text
+from synthesizer_interface.synthesis_cache import SynthesisCache
+from synthesizer_interface.synthesis_pool import default_workers, start_synthesizer
+from synthesizer_interface.utils import get_cache_dir
+from synthesizer_interface.word_suggestions import WordSuggester
+
+MAX_SUGGESTIONS = 20  # most suggestions one /suggest request may ask for
+
+
+class BatcherFull(Exception):
+    """The batcher's queue has no room for the chunks of a request"""
+
+
+class SynthesisBatcher:
+    """Collects the chunks of concurrent requests and synthesizes them in micro-batches.
+
+    A batch takes up to max_batch queued chunks, waiting max_wait seconds
+    for more when fewer are queued, and synthesizes identical chunks once.
+    Batches run one after another on a single thread, so a model in this
+    process is never called concurrently; with a pool, the chunks of a
+    batch run in parallel on its workers. A model that can batch gets
+    chunks of similar length in one call. At most max_queue chunks wait,
+    a request whose chunks do not fit is rejected with BatcherFull.
+    """
+
+    def __init__(self, synthesizer, max_batch: int = 8, max_wait: float = 0.005, max_queue: int = 256):
+        self.synthesizer = synthesizer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.pending = deque()  # (text, speaker, future)
+        self.batches = 0
+        self.chunks = 0
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='synthesis')
+        self._wakeup = None
+        self._task = None
+
+    def start(self):
+        """Start batching on the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for _, _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, chunks: list) -> list:
+        """Queue (text, speaker) chunks, return a future of the audio of each"""
+        if len(self.pending) + len(chunks) > self.max_queue:
+            raise BatcherFull(f"{len(self.pending)} chunks are queued already")
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text, speaker in chunks:
+            future = loop.create_future()
+            self.pending.append((text, speaker, future))
+            futures.append(future)
+        self._wakeup.set()
+        return futures
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            if len(self.pending) < self.max_batch:
+                await asyncio.sleep(self.max_wait)  # Let concurrent requests join the batch
+
+            # Identical chunks of different requests are synthesized once
+            groups = {}
+            while self.pending and len(groups) < self.max_batch:
+                text, speaker, future = self.pending.popleft()
+                if not future.cancelled():
+                    groups.setdefault((text, speaker), []).append(future)
+            if not groups:
+                continue
+            chunks = list(groups)
+            try:
+                results = await loop.run_in_executor(self._executor, self.synthesizer.synthesize_many, chunks)
+            except Exception as e:
+                results = [e] * len(chunks)
+            self.batches += 1
+            self.chunks += len(chunks)
+
+            for chunk, result in zip(chunks, results):
+                for future in groups[chunk]:
+                    if future.cancelled():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+
+class SynthesisServer:
+    """aiohttp handlers for /tts, /ws and /suggest.
+
+    suggester may be None until WordSuggester is loaded, /suggest answers
+    503 meanwhile.
+    """
+
+    def __init__(self, synthesizer, batcher: SynthesisBatcher = None, suggester=None, speaker: str = 'baya'):
+        self.synthesizer = synthesizer
+        self.batcher = batcher or SynthesisBatcher(synthesizer)
+        self.suggester = suggester
+        self.speaker = speaker
+        self._loading = None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.get('/tts', self.handle_tts),
+            web.post('/tts', self.handle_tts),
+            web.get('/ws', self.handle_ws),
+            web.get('/suggest', self.handle_suggest),
+            web.get('/stats', self.handle_stats),
+        ])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        self.batcher.start()
+
+    async def _on_cleanup(self, app):
+        await self.batcher.close()
+
+    async def load_suggester(self, app=None):
+        """Start loading WordSuggester in the background, the server answers meanwhile"""
+        self._loading = asyncio.get_running_loop().run_in_executor(None, self._load_suggester)
+
+    def _load_suggester(self):
+        try:
+            self.suggester = WordSuggester()
+        except Exception as e:
+            print(f"Error loading word suggestions: {e}")
+
+    def chunks(self, params: dict) -> list:
+        """Get the (text, speaker) chunks of a request's text"""
+        text = params.get('text')
+        if not isinstance(text, str) or not text.strip():
+            raise web.HTTPBadRequest(text="text is required")
+        speaker = params.get('speaker') or self.speaker
+        chunks = [(chunk, speaker) for chunk in split_text(text)]
+        if not chunks:
+            raise web.HTTPBadRequest(text="text has no words to synthesize")
+        if len(chunks) > self.batcher.max_queue:
+            raise web.HTTPRequestEntityTooLarge(self.batcher.max_queue, len(chunks),
+                                                text=f"text has more than {self.batcher.max_queue} sentences")
+        return chunks
+
+    def submit(self, chunks: list) -> list:
+        try:
+            return self.batcher.submit(chunks)
+        except BatcherFull as e:
+            raise web.HTTPServiceUnavailable(text=f"Server busy: {e}", headers={'Retry-After': '1'})
+
+    async def handle_tts(self, request: web.Request) -> web.Response:
+        params = await _params(request)
+        audio_format = params.get('format') or 'wav'
+        if audio_format not in FORMATS:
+            raise web.HTTPBadRequest(text=f"format must be one of {', '.join(FORMATS)}")
+        futures = self.submit(self.chunks(params))
+        try:
+            audio = await asyncio.gather(*futures)
+        except Exception as e:
+            raise web.HTTPInternalServerError(text=f"Error synthesizing audio: {e}")
+        finally:
+            for future in futures:
+                future.cancel()  # Chunks of a dropped request are not synthesized
+        # Normalized as a whole, like Synthesizer.produce
+        audio = self.synthesizer.normalize(self.synthesizer.join(audio))
+        # MP3 and OGG run ffmpeg, which would block the event loop
+        body = await asyncio.get_running_loop().run_in_executor(
+            None, encode_audio, audio, self.synthesizer.sample_rate, audio_format)
+        return web.Response(body=body, content_type=CONTENT_TYPES[audio_format])
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type != web.WSMsgType.TEXT:
+                continue
+            try:
+                params = json.loads(message.data)
+                futures = self.submit(self.chunks(params if isinstance(params, dict) else {}))
+            except ValueError:
+                await ws.send_json({'error': "messages must be JSON objects"})
+                continue
+            except web.HTTPException as e:
+                await ws.send_json({'error': e.text})
+                continue
+            await self._stream(ws, futures)
+        return ws
+
+    async def _stream(self, ws: web.WebSocketResponse, futures: list):
+        """Send the audio of futures in order, each as soon as it and the ones before it are ready"""
+        leveler = Leveler()
+        try:
+            await ws.send_json({'sample_rate': self.synthesizer.sample_rate, 'chunks': len(futures)})
+            for i, future in enumerate(futures):
+                try:
+                    audio = await future
+                except Exception as e:
+                    await ws.send_json({'error': f"Error synthesizing audio: {e}"})
+                    return
+                if i:
+                    await ws.send_bytes(self.synthesizer.pause.tobytes())
+                # send_bytes waits while the client is slow to read
+                await ws.send_bytes(leveler(audio).astype('<i2', copy=False).tobytes())
+            await ws.send_json({'done': True})
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def handle_suggest(self, request: web.Request) -> web.Response:
+        if self.suggester is None:
+            raise web.HTTPServiceUnavailable(text="Word suggestions are loading", headers={'Retry-After': '1'})
+        params = await _params(request)
+        text = params.get('text', '')
+        try:
+            n = int(params.get('n', 5))
+            cursor = int(params['cursor']) if params.get('cursor') is not None else None
+        except (TypeError, ValueError):
+            raise web.HTTPBadRequest(text="n and cursor must be integers")
+        if not 1 <= n <= MAX_SUGGESTIONS:
+            raise web.HTTPBadRequest(text=f"n must be between 1 and {MAX_SUGGESTIONS}")
+        if cursor is not None and not 0 <= cursor <= len(text):
+            raise web.HTTPBadRequest(text=f"cursor must be between 0 and {len(text)}")
+        suggestions = await asyncio.get_running_loop().run_in_executor(
+            None, self.suggester.get_suggestions, text, n, cursor)
+        return web.json_response({'suggestions': suggestions})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        stats = tracing.tracer.stats() if tracing.tracer is not None else {'spans': {}, 'counters': {}}
+        stats['batcher'] = {'batches': self.batcher.batches, 'chunks': self.batcher.chunks,
+                            'queued': len(self.batcher.pending)}
+        if self.synthesizer.cache is not None:
+            stats['synthesis_cache'] = self.synthesizer.cache.info()
+        return web.json_response(stats)
+
+
+async def _params(request: web.Request) -> dict:
+    if request.method != 'POST':
+        return dict(request.query)
+    try:
+        params = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="body must be a JSON object")
+    if not isinstance(params, dict):
+        raise web.HTTPBadRequest(text="body must be a JSON object")
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthesis and word suggestions over HTTP and WebSocket.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--speaker', default='baya', help="speaker of requests without one")
+    parser.add_argument('--sample-rate', type=int, default=48000)
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help="synthesis worker processes, 0 to synthesize in this process")
+    parser.add_argument('--threads', type=int, default=None, help="torch threads per worker")
+    parser.add_argument('--fast', action='store_true', help="quantized and frozen model, faster on CPU")
+    parser.add_argument('--max-batch', type=int, default=8, help="chunks synthesized together")
+    parser.add_argument('--max-wait-ms', type=float, default=5, help="wait for more chunks to fill a batch")
+    parser.add_argument('--max-queue', type=int, default=256, help="queued chunks before requests are rejected")
+    parser.add_argument('--no-suggest', action='store_true', help="do not load word suggestions")
+    args = parser.parse_args(argv)
+    tracing.enable_from_env()
+
+    cache = SynthesisCache(get_cache_dir())
+    synthesizer, pool = start_synthesizer(args.workers, args.threads, args.sample_rate, cache=cache,
+                                          fast=args.fast, batch_size=args.max_batch)
+    batcher = SynthesisBatcher(synthesizer, args.max_batch, args.max_wait_ms / 1000, args.max_queue)
+    server = SynthesisServer(synthesizer, batcher, speaker=args.speaker)
+    app = server.app()
+    if not args.no_suggest:
+        app.on_startup.append(server.load_suggester)
+    try:
+        web.run_app(app, host=args.host, port=args.port)
+    finally:
+        cache.close()
+        if pool is not None:
+            pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+from PyQt5 import QtCore, QtWidgets
+
+from synthesizer_interface import tracing
+
+
+class StatsDialog(QtWidgets.QDialog):
+    """Shows the tracing spans and counters, and exports them as a Chrome trace.
+
+    cache_info returns {name: info dict} of caches to show with the
+    counters, such as the synthesis cache's info().
+    """
+
+    COLUMNS = ('Имя', 'Число', 'Всего, мс', 'Среднее, мс', 'Максимум, мс')
+
+    def __init__(self, cache_info=None, parent=None):
+        super().__init__(parent)
+        self.cache_info = cache_info
+        self.setWindowTitle("Статистика")
+        self.resize(640, 480)
+
+        self.enabled_box = QtWidgets.QCheckBox("Трассировка включена")
+        self.enabled_box.setChecked(tracing.is_enabled())
+        self.enabled_box.toggled.connect(self.set_enabled)
+
+        self.table = QtWidgets.QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+
+        refresh = QtWidgets.QPushButton("Обновить")
+        refresh.clicked.connect(self.refresh)
+        reset = QtWidgets.QPushButton("Сбросить")
+        reset.clicked.connect(self.reset)
+        self.export_button = QtWidgets.QPushButton("Сохранить трассу...")
+        self.export_button.clicked.connect(self.export)
+
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(refresh)
+        buttons.addWidget(reset)
+        buttons.addStretch()
+        buttons.addWidget(self.export_button)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.enabled_box)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+        # Refreshes itself while open
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    def rows(self) -> list:
+        """Span rows, then counter and cache rows with only the name and number"""
+        rows = []
+        if tracing.tracer is not None:
+            stats = tracing.tracer.stats()
+            for name, span in sorted(stats['spans'].items()):
+                rows.append((name, span['count'], span['total_ms'], span['mean_ms'], span['max_ms']))
+            for name, value in sorted(stats['counters'].items()):
+                rows.append((name, value))
+        if self.cache_info is not None:
+            for cache, info in self.cache_info().items():
+                for key, value in info.items():
+                    rows.append((f'{cache}.{key}', round(value, 3) if isinstance(value, float) else value))
+        return rows
+
+    def refresh(self):
+        rows = self.rows()
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j in range(len(self.COLUMNS)):
+                item = QtWidgets.QTableWidgetItem(str(row[j]) if j < len(row) else '')
+                if j:
+                    item.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+                self.table.setItem(i, j, item)
+        self.export_button.setEnabled(tracing.is_enabled())
+
+    def set_enabled(self, enabled: bool):
+        if enabled:
+            tracing.enable()
+        else:
+            tracing.disable()
+        self.refresh()
+
+    def reset(self):
+        if tracing.tracer is not None:
+            tracing.tracer.reset()
+        self.refresh()
+
+    def export(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Сохранить трассу", 'trace.json',
+                                                        "JSON (*.json)")
+        if path and tracing.tracer is not None:
+            tracing.tracer.export(path)
+
+    def showEvent(self, event):
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
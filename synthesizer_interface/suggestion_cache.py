@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+
+
+class SuggestionCache:
+    """Bounded LRU cache of suggestion lists keyed by (prev_word, prefix, n).
+
+    An empty prefix means the previous word is completed and the entry holds
+    next-word suggestions. Entries can also expire after ttl seconds.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (time stored, suggestions)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple):
+        """Get cached suggestions for key, or None"""
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry[1])
+
+    def put(self, key: tuple, suggestions: list):
+        self._entries[key] = (time.monotonic(), list(suggestions))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, words=(), pairs=()):
+        """Drop entries whose suggestions depend on the given unigram words or bigram pairs.
+
+        Unigram counts matter to entries with a non-empty prefix of the word;
+        bigram counts matter to entries for the pair's first word with a
+        prefix of its second word.
+        """
+        words = [word.lower() for word in words]
+        pairs = [(word1.lower(), word2.lower()) for word1, word2 in pairs]
+        stale = [key for key in self._entries if self._depends_on(key, words, pairs)]
+        for key in stale:
+            del self._entries[key]
+
+    @staticmethod
+    def _depends_on(key: tuple, words: list, pairs: list) -> bool:
+        prev_word, prefix, _ = key
+        if prefix and any(word.startswith(prefix) for word in words):
+            return True
+        return any(word1 == prev_word and word2.startswith(prefix) for word1, word2 in pairs)
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self) -> dict:
+        """Get hit/miss counters and size, for tuning maxsize"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
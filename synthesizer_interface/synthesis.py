@@ -0,0 +1,507 @@
+import queue
+import re
+import threading
+import time
+
+import numpy as np
+
+from synthesizer_interface import tracing
+from synthesizer_interface.synthesis_cache import normalize_text
+
+MAX_CHUNK_CHARS = 800  # the model rejects inputs much longer than this
+PAUSE_SECONDS = 0.15  # silence between chunks, which are synthesized separately
+SENTENCE_END = re.compile(r'(?<=[.!?…])\s+|\n+')
+CLAUSE_END = re.compile(r'(?<=[,;:—])\s+')
+WORD_END = re.compile(r'\s+')
+BATCH_SIZE = 8  # chunks synthesized in one call by models that can batch
+PCM_VERSION = 'fixed-gain'  # part of cache keys, changes when cached chunks are scaled differently
+MAX_PADDING = 1.5  # the longest chunk of a batch is at most this many times as long as the shortest
+
+
+def _sounddevice():
+    """Import sounddevice on first use, it loads PortAudio, which only playback needs"""
+    import sounddevice
+    return sounddevice
+
+
+class CallbackStop(Exception):
+    """Raised by a stream callback to end playback, sounddevice's own is raised for its streams"""
+
+
+def _sounddevice_output_stream(callback, **kwargs):
+    """sounddevice.OutputStream whose callback raises sounddevice.CallbackStop for CallbackStop"""
+    sounddevice = _sounddevice()
+
+    def stop_callback(*args):
+        try:
+            callback(*args)
+        except CallbackStop:
+            raise sounddevice.CallbackStop
+
+    return sounddevice.OutputStream(callback=stop_callback, **kwargs)
+
+
+def split_text(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list:
+    """Split text into sentences, and sentences longer than max_chars into clauses and words"""
+    chunks = []
+    for sentence in SENTENCE_END.split(text):
+        chunks.extend(_split_long(sentence.strip(), max_chars))
+    # Chunks without letters or digits are not speech, the model fails on them
+    return [chunk for chunk in chunks if any(char.isalnum() for char in chunk)]
+
+
+def _split_long(text: str, max_chars: int) -> list:
+    if len(text) <= max_chars:
+        return [text]
+    for pattern in (CLAUSE_END, WORD_END):
+        parts = pattern.split(text)
+        if len(parts) > 1:
+            break
+    else:
+        # One very long word
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+    # Pack parts back together up to max_chars
+    chunks = []
+    current = ''
+    for part in parts:
+        if current and len(current) + 1 + len(part) > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f'{current} {part}' if current else part
+    chunks.append(current)
+    return [piece for chunk in chunks for piece in _split_long(chunk, max_chars)]
+
+
+def group_by_length(texts: list, batch_size: int = BATCH_SIZE, max_padding: float = MAX_PADDING) -> list:
+    """Group the indices of texts into batches of similar length, so that little of a batch is padding"""
+    batches = []
+    for i in sorted(range(len(texts)), key=lambda i: len(texts[i])):
+        batch = batches[-1] if batches else None
+        if batch is None or len(batch) >= batch_size or len(texts[i]) > max_padding * max(1, len(texts[batch[0]])):
+            batches.append([i])
+        else:
+            batch.append(i)
+    return batches
+
+
+class Leveler:
+    """Scales the chunks of one utterance to full 16-bit range by the loudest chunk so far.
+
+    Sentences keep their loudness relative to each other, as when the whole
+    utterance is normalized at once, except that chunks before the loudest
+    one come out louder: a stream cannot wait for the end of the utterance.
+    """
+
+    def __init__(self):
+        self.peak = 0
+
+    def __call__(self, audio: np.ndarray) -> np.ndarray:
+        if len(audio):
+            self.peak = max(self.peak, int(audio.max()), -int(audio.min()))
+        if not self.peak:
+            return audio
+        return np.clip(np.rint(audio * (32767 / self.peak)), -32768, 32767).astype(np.int16)
+
+
+class Synthesizer:
+    """Turns text into 16-bit audio, one sentence-sized chunk at a time.
+
+    With a SynthesisCache, the audio of every chunk is cached on its own,
+    so after an edit only the changed and new sentences are synthesized
+    again. Chunks are joined with pause_seconds of silence. Chunks keep the
+    model's gain, an utterance is brought to full range as a whole by
+    produce, or by the loudest chunk so far by stream.
+
+    With a SynthesisPool, chunks that are not cached are synthesized in
+    parallel on the pool's worker processes and model may be None.
+
+    Models with apply_tts_batch synthesize up to batch_size chunks of
+    similar length in one call; it takes a list of texts and the other
+    apply_tts arguments and returns their audio padded to the longest
+    one, and the length of each. Other models get one call per chunk.
+    """
+
+    def __init__(self, model, sample_rate: int = 48000, put_accent: bool = True, put_yo: bool = True,
+                 cache=None, model_version: str = '', pause_seconds: float = PAUSE_SECONDS, pool=None,
+                 batch_size: int = BATCH_SIZE):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.put_accent = put_accent
+        self.put_yo = put_yo
+        self.cache = cache
+        self.model_version = model_version
+        self.pause = np.zeros(int(sample_rate * pause_seconds), dtype=np.int16)
+        self.pool = pool
+        self.batch_size = batch_size
+
+    def can_batch(self) -> bool:
+        """Check if chunks are synthesized in batches, by the model or by the pool's workers"""
+        if self.batch_size < 2:
+            return False
+        if self.pool is not None:
+            return self.pool.batches
+        return hasattr(self.model, 'apply_tts_batch')
+
+    def cache_key(self, text: str, speaker: str):
+        """Get the cache key of a chunk, or None if its audio must not be cached"""
+        if self.cache is None or speaker == 'random':
+            return None  # The random speaker sounds different on every call
+        return self.cache.key(normalize_text(text), speaker, self.sample_rate, self.put_accent, self.put_yo,
+                              self.model_version, PCM_VERSION)
+
+    def synthesize(self, text: str, speaker: str) -> np.ndarray:
+        """Synthesize one chunk as 16-bit PCM"""
+        with tracing.span('synthesize.model', chars=len(text)):
+            audio = self.model.apply_tts(
+                text=text,
+                speaker=speaker,
+                sample_rate=self.sample_rate,
+                put_accent=self.put_accent,
+                put_yo=self.put_yo
+            )
+        return self._to_pcm(audio)
+
+    def synthesize_batch(self, texts: list, speaker: str) -> list:
+        """Synthesize chunks as 16-bit PCM, in batches of similar length if the model can batch"""
+        if len(texts) < 2 or not self.can_batch():
+            return [self.synthesize(text, speaker) for text in texts]
+        results = [None] * len(texts)
+        for batch in group_by_length(texts, self.batch_size):
+            if len(batch) == 1:
+                results[batch[0]] = self.synthesize(texts[batch[0]], speaker)
+                continue
+            with tracing.span('synthesize.batch', size=len(batch), chars=sum(len(texts[i]) for i in batch)):
+                audio, lengths = self.model.apply_tts_batch(
+                    texts=[texts[i] for i in batch],
+                    speaker=speaker,
+                    sample_rate=self.sample_rate,
+                    put_accent=self.put_accent,
+                    put_yo=self.put_yo
+                )
+            # Cut the padding off every row
+            for row, i in enumerate(batch):
+                results[i] = self._to_pcm(audio[row, :int(lengths[row])])
+        return results
+
+    @staticmethod
+    def _to_pcm(audio) -> np.ndarray:
+        with tracing.span('synthesize.normalize'):
+            # A fixed gain, the utterance's chunks are normalized together by level or normalize
+            audio = (audio * 32767).clamp(-32768, 32767)
+            return audio.detach().cpu().numpy().astype(np.int16)
+
+    @staticmethod
+    def level(chunks):
+        """Yield chunks of one utterance scaled by the loudest chunk so far, see Leveler"""
+        leveler = Leveler()
+        for audio in chunks:
+            yield leveler(audio)
+
+    @staticmethod
+    def normalize(audio: np.ndarray) -> np.ndarray:
+        """Scale a whole utterance to full 16-bit range by its peak"""
+        return Leveler()(audio)
+
+    def stream(self, text: str, speaker: str):
+        """Yield the leveled audio of text chunk by chunk, in order, with pauses between chunks"""
+        for i, audio in enumerate(self.level(self.chunks(text, speaker))):
+            if i:
+                yield self.pause
+            yield audio
+
+    def chunks(self, text: str, speaker: str):
+        """Yield the audio of every chunk of text at the model's gain, in order, without pauses"""
+        if self.pool is not None:
+            return self._pooled(split_text(text), speaker)
+        if self.can_batch():
+            return self._batched(split_text(text), speaker)
+        return (self.synthesize_cached(chunk, speaker) for chunk in split_text(text))
+
+    def _windows(self, chunks: list) -> list:
+        """Split chunks into the first one alone, so that it is ready sooner, and batch_size at a time"""
+        size = self.batch_size if self.can_batch() else 1
+        return [chunks[:1]] + [chunks[i:i + size] for i in range(1, len(chunks), size)] if chunks else []
+
+    def _batched(self, chunks: list, speaker: str):
+        """Yield the audio of chunks in order, synthesized a window at a time"""
+        for window in self._windows(chunks):
+            for audio in self.synthesize_many([(chunk, speaker) for chunk in window]):
+                if isinstance(audio, Exception):
+                    raise audio
+                yield audio
+
+    def _pooled(self, chunks: list, speaker: str):
+        """Yield the audio of chunks in order, all of them submitted to the pool at once"""
+        jobs = []  # (cache keys, cached audio or None, Future of the rest) per window
+        for window in self._windows(chunks):
+            keys = [self.cache_key(chunk, speaker) for chunk in window]
+            cached = [self.cache.get(key) if key is not None else None for key in keys]
+            missing = [chunk for chunk, audio in zip(window, cached) if audio is None]
+            jobs.append((keys, cached, self.pool.submit_batch(missing, speaker) if missing else None))
+        try:
+            for keys, cached, job in jobs:
+                synthesized = iter(job.result()) if job is not None else None
+                for key, audio in zip(keys, cached):
+                    if audio is None:
+                        audio = next(synthesized)
+                        if key is not None:
+                            self.cache.put(key, audio)
+                    yield audio
+        finally:
+            # A stopped stream leaves the workers to other requests
+            for _, _, job in jobs:
+                if job is not None:
+                    job.cancel()
+
+    def synthesize_many(self, chunks: list) -> list:
+        """Synthesize (text, speaker) chunks, on the pool at once if there is one.
+
+        Chunks of a speaker are synthesized in batches of similar length if
+        the model can batch. The result of a chunk that fails is its
+        exception, the other chunks are not affected by it.
+        """
+        results = [None] * len(chunks)
+        missing = {}  # speaker -> [(index, cache key)]
+        for i, (text, speaker) in enumerate(chunks):
+            key = self.cache_key(text, speaker)
+            audio = self.cache.get(key) if key is not None else None
+            if audio is not None:
+                results[i] = audio
+            else:
+                missing.setdefault(speaker, []).append((i, key))
+
+        batch_size = self.batch_size if self.can_batch() else 1
+        jobs = []  # (speaker, [(index, cache key)], Future or None)
+        for speaker, items in missing.items():
+            for batch in group_by_length([chunks[i][0] for i, _ in items], batch_size):
+                batch = [items[j] for j in batch]
+                texts = [chunks[i][0] for i, _ in batch]
+                jobs.append((speaker, batch, self.pool.submit_batch(texts, speaker) if self.pool is not None else None))
+        for speaker, batch, job in jobs:
+            texts = [chunks[i][0] for i, _ in batch]
+            try:
+                audios = job.result() if job is not None else self.synthesize_batch(texts, speaker)
+            except Exception as e:
+                # Find out which chunks of the batch fail
+                audios = self._each(texts, speaker) if len(texts) > 1 else [e]
+            for (i, key), audio in zip(batch, audios):
+                if key is not None and not isinstance(audio, Exception):
+                    self.cache.put(key, audio)
+                results[i] = audio
+        return results
+
+    def _each(self, texts: list, speaker: str) -> list:
+        """Synthesize texts one by one, the result of one that fails is its exception"""
+        jobs = [self.pool.submit(text, speaker) for text in texts] if self.pool is not None else None
+        results = []
+        for n, text in enumerate(texts):
+            try:
+                results.append(jobs[n].result() if jobs is not None else self.synthesize(text, speaker))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def synthesize_cached(self, text: str, speaker: str) -> np.ndarray:
+        """Synthesize one chunk, or take its audio from the cache"""
+        key = self.cache_key(text, speaker)
+        if key is None:
+            return self.synthesize(text, speaker)
+        audio = self.cache.get(key)
+        if audio is None:
+            audio = self.synthesize(text, speaker)
+            self.cache.put(key, audio)
+        return audio
+
+    def join(self, chunks) -> np.ndarray:
+        """Join the audio of chunks with pauses between them"""
+        joined = []
+        for i, audio in enumerate(chunks):
+            if i:
+                joined.append(self.pause)
+            joined.append(audio)
+        if not joined:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate(joined)
+
+    def produce(self, text: str, speaker: str) -> np.ndarray:
+        """Synthesize the whole text as 16-bit PCM, normalized as a whole"""
+        with tracing.span('produce', chars=len(text)):
+            return self.normalize(self.join(self.chunks(text, speaker)))
+
+
+class StreamPlayer:
+    """Plays audio chunks while later chunks are still being synthesized.
+
+    A worker thread pulls chunks from an iterable into a bounded queue, so
+    at most queue_size chunks wait in memory. The sounddevice callback
+    copies from the queue into the output buffer and plays silence if the
+    next chunk is not ready yet, or while playback is paused.
+
+    output_stream builds the stream, sounddevice.OutputStream by default;
+    DummyOutputStream plays without an audio device.
+    """
+
+    def __init__(self, sample_rate: int, queue_size: int = 4, blocksize: int = 2048,
+                 output_stream=None):
+        self.sample_rate = sample_rate
+        self.queue_size = queue_size
+        self.blocksize = blocksize
+        self.output_stream = output_stream
+        self.stream = None
+        self.paused = False
+        self.frames_played = 0
+        self._stopped = threading.Event()
+        self._finished = threading.Event()
+        self._finished.set()
+
+    def play(self, chunks):
+        """Start playing an iterable of audio chunks, returns right away"""
+        self.stop()
+        self._queue = queue.Queue(self.queue_size)
+        self._buffer = np.zeros(0, dtype=np.int16)
+        self._ended = False
+        self.paused = False
+        self.frames_played = 0
+        self._started_at = time.perf_counter()
+        self._stopped = threading.Event()
+        self._finished = threading.Event()
+        self._producer = threading.Thread(target=self._produce, args=(chunks, self._queue, self._stopped),
+                                          name='synthesis', daemon=True)
+        self._producer.start()
+        output_stream = self.output_stream or _sounddevice_output_stream
+        self.stream = output_stream(samplerate=self.sample_rate, channels=1, dtype='int16',
+                                    blocksize=self.blocksize, callback=self._callback,
+                                    finished_callback=self._finished.set)
+        self.stream.start()
+
+    def _produce(self, chunks, chunk_queue, stopped):
+        try:
+            for chunk in chunks:
+                # Wait for room in the queue, unless playback is stopped meanwhile
+                while not stopped.is_set():
+                    try:
+                        chunk_queue.put(chunk, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stopped.is_set():
+                    return
+        except Exception as e:
+            print(f"Error synthesizing audio: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            # None marks the end of the audio
+            while not stopped.is_set():
+                try:
+                    chunk_queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def _callback(self, outdata, frames, time_info, status):
+        if self.paused:
+            outdata[:] = 0
+            return
+        written = 0
+        while written < frames:
+            if not len(self._buffer):
+                if self._ended:
+                    break
+                try:
+                    chunk = self._queue.get_nowait()
+                except queue.Empty:
+                    if self.frames_played or written:
+                        tracing.count('playback.underrun')  # a gap, not the wait for the first chunk
+                    break  # The next chunk is still being synthesized
+                if chunk is None:
+                    self._ended = True
+                    break
+                self._buffer = chunk
+            count = min(frames - written, len(self._buffer))
+            outdata[written:written + count, 0] = self._buffer[:count]
+            self._buffer = self._buffer[count:]
+            written += count
+        outdata[written:] = 0
+        if written and not self.frames_played:
+            tracing.add('playback.first_audio', self._started_at, time.perf_counter() - self._started_at)
+        self.frames_played += written
+        if self._ended and not len(self._buffer):
+            tracing.add('playback', self._started_at, time.perf_counter() - self._started_at,
+                        audio_seconds=self.seconds_played())
+            raise CallbackStop
+
+    def seconds_played(self) -> float:
+        return self.frames_played / self.sample_rate
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def is_playing(self) -> bool:
+        return not self._finished.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Wait until playback ends, return False on timeout"""
+        return self._finished.wait(timeout)
+
+    def stop(self):
+        """Stop playback and synthesis of the remaining chunks"""
+        self._stopped.set()
+        if self.stream is not None:
+            self.stream.abort()
+            self.stream.close()
+            self.stream = None
+        self._finished.set()
+
+
+class DummyOutputStream:
+    """Stand-in for sounddevice.OutputStream that needs no audio device.
+
+    A thread calls the callback block by block, in real time unless
+    realtime is False, and keeps everything written in frames.
+    """
+
+    def __init__(self, samplerate, channels, dtype, blocksize, callback, finished_callback=None,
+                 realtime: bool = True):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+        self.blocksize = blocksize
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self.realtime = realtime
+        self.frames = []
+        self.active = False
+        self._thread = None
+
+    def start(self):
+        self.active = True
+        self._thread = threading.Thread(target=self._run, name='dummy-audio', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self.active:
+            outdata = np.zeros((self.blocksize, self.channels), dtype=self.dtype)
+            try:
+                self.callback(outdata, self.blocksize, None, None)
+            except CallbackStop:
+                self.active = False
+            self.frames.append(outdata)
+            if self.realtime:
+                time.sleep(self.blocksize / self.samplerate)
+        if self.finished_callback is not None:
+            self.finished_callback()
+
+    def abort(self):
+        self.active = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    stop = abort
+
+    def close(self):
+        pass
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace, which does not change the synthesized audio"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class SynthesisCache:
+    """Synthesized 16-bit PCM keyed by a hash of the text and synthesis settings.
+
+    Recent entries are kept in memory, least recently used first out once
+    they take more than memory_budget bytes. Entries pushed out of memory,
+    and all entries on close(), are written to cache_dir, which is pruned
+    to disk_budget bytes oldest file first.
+    """
+
+    def __init__(self, cache_dir: str = None, memory_budget: int = 64 << 20, disk_budget: int = 512 << 20):
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self._entries = OrderedDict()  # key -> np.int16 array
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Hash the text and settings that determine the audio"""
+        return hashlib.sha1('\x1f'.join(map(str, parts)).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + '.pcm')
+
+    def get(self, key: str):
+        """Get cached audio for key, or None"""
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+        audio = self._read(key)
+        if audio is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(key, audio)
+        return audio
+
+    def put(self, key: str, audio: np.ndarray):
+        audio = np.ascontiguousarray(audio, dtype=np.int16)
+        audio.setflags(write=False)  # shared by everyone who gets it
+        self._remember(key, audio)
+
+    def _remember(self, key: str, audio: np.ndarray):
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._memory_used -= old.nbytes
+            self._entries[key] = audio
+            self._memory_used += audio.nbytes
+            while self._memory_used > self.memory_budget and len(self._entries) > 1:
+                old_key, old = self._entries.popitem(last=False)
+                self._memory_used -= old.nbytes
+                evicted.append((old_key, old))
+        for old_key, old in evicted:
+            self._write(old_key, old)
+        if evicted:
+            self._prune()
+
+    def _read(self, key: str):
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            audio = np.fromfile(path, dtype='<i2').astype(np.int16, copy=False)
+            os.utime(path)  # mark it as recently used for pruning
+        except OSError:
+            return None
+        audio.setflags(write=False)
+        return audio
+
+    def _write(self, key: str, audio: np.ndarray):
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            audio.astype('<i2', copy=False).tofile(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing synthesis cache: {e}")
+
+    def _prune(self):
+        """Delete the least recently used files over disk_budget"""
+        if self.cache_dir is None:
+            return
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith('.pcm'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # removed by a concurrent prune
+                files.append((stat.st_mtime, stat.st_size, path))
+        used = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if used <= self.disk_budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            used -= size
+
+    def close(self):
+        """Write the entries held in memory to disk"""
+        with self._lock:
+            entries = list(self._entries.items())
+        for key, audio in entries:
+            self._write(key, audio)
+        self._prune()
+
+    def info(self) -> dict:
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'memory_used': self._memory_used,
+        }
@@ -0,0 +1,146 @@
+import functools
+import multiprocessing
+import os
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, wait
+
+from synthesizer_interface import tracing
+from synthesizer_interface.fast_inference import FAST_VERSION
+from synthesizer_interface.model_store import ModelStore, load_stored_model
+from synthesizer_interface.synthesis import BATCH_SIZE, Synthesizer
+from synthesizer_interface.utils import setup_torch
+
+_synthesizer = None  # the worker process's own Synthesizer
+_started = None  # barrier that every worker reaches once its model is loaded
+
+
+def _init_worker(model_factory, sample_rate, put_accent, put_yo, batch_size, intra_threads, interop_threads, started):
+    global _synthesizer, _started
+    _started = started
+    torch = setup_torch()
+    # Both must be set before the first inference in this process
+    torch.set_num_threads(intra_threads)
+    torch.set_num_interop_threads(interop_threads)
+    _synthesizer = Synthesizer(model_factory(), sample_rate, put_accent, put_yo, batch_size=batch_size)
+
+
+def _synthesize(text, speaker, traced=False):
+    return _run(_synthesizer.synthesize, traced, text, speaker)
+
+
+def _synthesize_batch(texts, speaker, traced=False):
+    return _run(_synthesizer.synthesize_batch, traced, texts, speaker)
+
+
+def _run(function, traced, *args):
+    if not traced:
+        return function(*args)
+    # The spans go back with the audio, for the parent's tracer
+    tracer = tracing.enable()
+    audio = function(*args)
+    return audio, tracer.drain()
+
+
+def _ready(timeout):
+    # Blocks its worker until all workers run it, so each one has loaded the model
+    _started.wait(timeout)
+    return _synthesizer.can_batch()
+
+
+def _merge_traced(job, future):
+    """Merge a traced job's worker spans and pass its audio on to future"""
+    try:
+        if job.cancelled():
+            future.cancel()
+        elif job.exception() is not None:
+            future.set_exception(job.exception())
+        else:
+            audio, events = job.result()
+            tracer = tracing.tracer  # read once, the GUI can disable tracing meanwhile
+            if tracer is not None:
+                tracer.merge(events)
+            future.set_result(audio)
+    except InvalidStateError:
+        pass  # future was cancelled meanwhile
+
+
+def default_workers() -> int:
+    """Half of the cores, at most 4: each worker holds a copy of the model"""
+    return max(1, min(4, (os.cpu_count() or 1) // 2))
+
+
+class SynthesisPool:
+    """Worker processes that each load the model once and synthesize chunks.
+
+    model_factory must be picklable, such as a module-level function; it
+    runs once in every worker. Each worker uses intra_threads threads
+    inside an operator (all cores split between workers by default) and
+    interop_threads threads across operators. Workers are spawned rather
+    than forked, which is safe with Qt and torch threads in the parent.
+    batches is True once started if the workers' model can batch chunks,
+    up to batch_size of them in one call.
+    """
+
+    def __init__(self, model_factory, workers: int = None, intra_threads: int = None, interop_threads: int = 1,
+                 sample_rate: int = 48000, put_accent: bool = True, put_yo: bool = True, batch_size: int = BATCH_SIZE):
+        self.workers = workers or default_workers()
+        self.batches = False
+        self.intra_threads = intra_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.interop_threads = interop_threads
+        context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_factory, sample_rate, put_accent, put_yo, batch_size, self.intra_threads,
+                      self.interop_threads, context.Barrier(self.workers)))
+
+    def start(self, timeout: float = 600):
+        """Start all workers and wait until each has loaded the model"""
+        futures = [self.executor.submit(_ready, timeout) for _ in range(self.workers)]
+        wait(futures)
+        # raises if a worker failed to load the model
+        self.batches = all([future.result() for future in futures])
+
+    def submit(self, text: str, speaker: str):
+        """Synthesize one chunk on a worker, return a Future of its 16-bit PCM"""
+        return self._submit(_synthesize, text, speaker)
+
+    def submit_batch(self, texts: list, speaker: str):
+        """Synthesize chunks together on one worker, return a Future of a list of their 16-bit PCM"""
+        return self._submit(_synthesize_batch, texts, speaker)
+
+    def _submit(self, function, *args):
+        if not tracing.is_enabled():
+            return self.executor.submit(function, *args)
+        job = self.executor.submit(function, *args, True)
+        future = Future()
+        future.add_done_callback(lambda f: f.cancelled() and job.cancel())
+        job.add_done_callback(lambda done: _merge_traced(done, future))
+        return future
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def start_synthesizer(workers: int, threads: int = None, sample_rate: int = 48000, cache=None, fast: bool = False,
+                      batch_size: int = BATCH_SIZE):
+    """Load the stored model on a started pool of workers, or in this process if workers is 0.
+
+    fast selects the quantized and frozen model of fast_inference, batch_size
+    is the most chunks synthesized in one call by a model that can batch.
+    Returns the Synthesizer and the pool, None without workers.
+    """
+    store = ModelStore()
+    store.fetch()
+    version = store.version + FAST_VERSION if fast else store.version
+    if workers:
+        factory = functools.partial(load_stored_model, fast=fast)
+        pool = SynthesisPool(factory, workers=workers, intra_threads=threads, sample_rate=sample_rate,
+                             batch_size=batch_size)
+        pool.start()
+        return Synthesizer(None, sample_rate, cache=cache, model_version=version, pool=pool,
+                           batch_size=batch_size), pool
+    if threads:
+        setup_torch().set_num_threads(threads)
+    model = load_stored_model(fast)
+    return Synthesizer(model, sample_rate, cache=cache, model_version=version, batch_size=batch_size), None
@@ -1,97 +1,54 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
+import functools
+import multiprocessing
 import os
-import sounddevice as sou_voi
 import sys
 import time
-import torch
-from pydub import AudioSegment
 import re
-import numpy as np
 
-from synthesizer_interface.utils import setup_env
-from synthesizer_interface.word_suggestions import WordSuggester
+from synthesizer_interface import tracing
+from synthesizer_interface.encoding import AudioWriter
+from synthesizer_interface.fast_inference import FAST_VERSION
+from synthesizer_interface.model_store import ModelStore, load_stored_model
+from synthesizer_interface.playback import PlaybackController
+from synthesizer_interface.stats_view import StatsDialog
+from synthesizer_interface.synthesis import StreamPlayer, Synthesizer
+from synthesizer_interface.synthesis_cache import SynthesisCache
+from synthesizer_interface.synthesis_pool import SynthesisPool
+from synthesizer_interface.utils import get_cache_dir, setup_env
+from synthesizer_interface.word_suggestions import PUNCTUATION, WordSuggester
+from synthesizer_interface.workers import ResourceLoader, SuggestionWorker
 
-class UiMainWindow(object):
-    def __init__(self):
-        # Initialize torch backend before loading model on Mac
-        if sys.platform == 'darwin':
-            import torch
-            torch.backends.quantized.engine = 'qnnpack'
-        
-        # Load model
-        print("Loading model...")
-        self.model, _ = torch.hub.load(
-            repo_or_dir='snakers4/silero-models',
-            model='silero_tts',
-            language='ru',
-            speaker='ru_v3',
-            verbose=False
-        )
-        self.sample_rate = 48000
+SUGGESTION_DELAY_MS = 120  # debounce interval between a keystroke and a suggestion lookup
+SYNTHESIS_WORKERS = None  # worker processes for synthesis, None picks from the number of cores
+DOWNLOAD_FORMAT = 'mp3'  # format of files saved by "Скачать"
+FAST_INFERENCE = False  # quantized and frozen model, faster on CPU at a small cost in quality
+CONTEXT_CHARS = 256  # characters before the cursor read for suggestions
 
-        # Initialize word suggestions
-        self.word_suggester = WordSuggester()
-        self.suggestion_buttons = []
 
-    def get_model_dir(self):
-        """Get path to store the model"""
-        if getattr(sys, 'frozen', False):
-            # If running as bundled app, store next to executable
-            base_dir = os.path.dirname(sys.executable)
-        else:
-            # If running from source, store in user's home directory
-            base_dir = os.path.expanduser('~')
-        
-        model_dir = os.path.join(base_dir, '.silero_models')
-        os.makedirs(model_dir, exist_ok=True)
-        return model_dir
+def has_previous_word(text):
+    """Check if text has a word before its last one, scanning back from the end"""
+    end = len(text)
+    while end and text[end - 1].isspace():
+        end -= 1
+    while end and not text[end - 1].isspace():
+        end -= 1
+    while end and text[end - 1].isspace():
+        end -= 1
+    return end > 0
 
-    def load_or_download_model(self):
-        """Load model from local cache or download if not present"""
-        try:
-            # Try to load local model first
-            model_path = os.path.join(self.model_dir, 'model.pt')
-            if os.path.exists(model_path):
-                print("Loading model from local cache...")
-                model = torch.jit.load(model_path)
-                model = torch.hub.load(
-                    repo_or_dir=self.model_dir,  # Use local directory
-                    model='silero_tts',
-                    language='ru',
-                    speaker='ru_v3',
-                    source='local',  # Indicate local source
-                    verbose=False
-                )
-                print("Model loaded successfully from cache")
-                return model
-            
-            # If not found locally, download and save
-            print("Downloading model...")
-            model, _ = torch.hub.load(
-                repo_or_dir='snakers4/silero-models',
-                model='silero_tts',
-                language='ru',
-                speaker='ru_v3',
-                verbose=False
-            )
-            
-            # Save the model's state dictionary to local cache
-            print("Saving model to local cache...")
-            # Define example inputs for tracing
-            example_text = "Привет, мир!"
-            example_audio = model(example_text)  # Generate example output
-        
-            # Trace the model
-            traced_model = torch.jit.trace(model, (example_text,))
-            print("Model saved successfully")
-            return model
-            
-        except Exception as e:
-            print(f"Error loading/downloading model: {e}")
-            import traceback
-            traceback.print_exc()
-            raise
 
+class UiMainWindow(object):
+    def __init__(self):
+        # The synthesizer and the word suggester are loaded on worker threads by setup_ui
+        self.sample_rate = 48000
+        self.synthesizer = None
+        self.playback = PlaybackController(StreamPlayer(self.sample_rate))
+        self.word_suggester = None
+        self.loaders = []  # (thread, loader) pairs
+        self.suggestion_buttons = []
+        self.suggestion_request = 0
+        self.stats_dialog = None
 
     def create_suggestion_buttons(self):
         """Create a row of suggestion buttons"""
@@ -137,8 +94,91 @@ class UiMainWindow(object):
         self.retranslate_ui(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
 
-        # Connect text changed signal
-        self.plain_text.textChanged.connect(self.update_suggestions)
+        # Suggestions are looked up on a worker thread once typing pauses
+        self.suggestion_timer = QtCore.QTimer(MainWindow)
+        self.suggestion_timer.setSingleShot(True)
+        self.suggestion_timer.setInterval(SUGGESTION_DELAY_MS)
+        self.suggestion_timer.timeout.connect(self.update_suggestions)
+        self.plain_text.textChanged.connect(self.suggestion_timer.start)
+        self.plain_text.cursorPositionChanged.connect(self.suggestion_timer.start)
+
+        # Timings of loading, suggestions and synthesis, for diagnosing slowness
+        self.stats_shortcut = QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+Shift+D"), MainWindow)
+        self.stats_shortcut.activated.connect(lambda: self.show_stats(MainWindow))
+
+        # The window is usable right away, features unlock as their resources load
+        self.statusBar.showMessage("Загрузка...")
+        self.start_loader(self.load_synthesizer, self.on_model_ready)
+        self.start_loader(WordSuggester, self.on_suggester_ready)
+
+    def load_synthesizer(self):
+        print("Loading model...")
+        store = ModelStore()
+        store.fetch()
+        # Each worker process loads the model once, chunks are synthesized in parallel
+        factory = functools.partial(load_stored_model, fast=FAST_INFERENCE)
+        pool = SynthesisPool(factory, workers=SYNTHESIS_WORKERS, sample_rate=self.sample_rate)
+        pool.start()
+        # Audio is shared by "Озвучить" and "Скачать" and kept across launches
+        version = store.version + FAST_VERSION if FAST_INFERENCE else store.version
+        return Synthesizer(None, self.sample_rate, cache=SynthesisCache(get_cache_dir()),
+                           model_version=version, pool=pool)
+
+    def start_loader(self, factory, on_ready, on_failed=None):
+        """Run factory on its own thread and pass the result to on_ready"""
+        thread = QtCore.QThread()
+        loader = ResourceLoader(factory)
+        loader.moveToThread(thread)
+        thread.started.connect(loader.run)
+        loader.loaded.connect(on_ready)
+        loader.failed.connect(on_failed or self.on_load_failed)
+        loader.finished.connect(thread.quit)
+        self.loaders = [(t, l) for t, l in self.loaders if not t.isFinished()]
+        self.loaders.append((thread, loader))
+        thread.start()
+
+    def on_model_ready(self, synthesizer):
+        self.synthesizer = synthesizer
+        self.button_voice_over.setEnabled(True)
+        self.button_download.setEnabled(True)
+        self.show_ready()
+
+    def on_suggester_ready(self, word_suggester):
+        self.word_suggester = word_suggester
+        self.start_suggestion_worker()
+        self.update_suggestions()  # For text typed while loading
+        self.show_ready()
+
+    def on_load_failed(self, message):
+        self.statusBar.showMessage(f"Ошибка загрузки: {message}")
+
+    def show_ready(self):
+        if self.synthesizer is not None and self.word_suggester is not None:
+            self.statusBar.showMessage("Готово", 3000)
+
+    def start_suggestion_worker(self):
+        """Move suggestion lookups to their own thread"""
+        self.suggestion_thread = QtCore.QThread()
+        self.suggestion_worker = SuggestionWorker(self.word_suggester, len(self.suggestion_buttons))
+        self.suggestion_worker.moveToThread(self.suggestion_thread)
+        self.suggestion_worker.ready.connect(self.show_suggestions)
+        self.suggestion_thread.start()
+
+    def shutdown(self):
+        """Stop worker threads before the application exits"""
+        self.playback.stop()
+        if self.synthesizer is not None:
+            self.synthesizer.cache.close()
+            self.synthesizer.pool.close()
+        for thread, _ in self.loaders:
+            thread.quit()
+            thread.wait()
+        if self.word_suggester is None:
+            return
+        self.suggestion_thread.quit()
+        self.suggestion_thread.wait()
+        # Flush learned words that are still only in the journal buffer
+        self.word_suggester.user_memory.close()
 
     def create_label(self):
         """Create and configure the main label."""
@@ -183,6 +223,7 @@ class UiMainWindow(object):
         self.button_voice_over.setObjectName("button_voice_over")
         self.button_voice_over.setText("Озвучить")
         self.button_voice_over.clicked.connect(self.generate_voice)
+        self.button_voice_over.setEnabled(False)  # Until the model is loaded
 
         self.button_download = QtWidgets.QPushButton(self.centralwidget)
         self.button_download.setGeometry(QtCore.QRect(120, 380, 191, 101))
@@ -190,6 +231,29 @@ class UiMainWindow(object):
         self.button_download.setObjectName("button_download")
         self.button_download.setText("Скачать")
         self.button_download.clicked.connect(self.download_audio)
+        self.button_download.setEnabled(False)
+
+        small_font = QtGui.QFont()
+        small_font.setPointSize(11)
+        small_font.setBold(True)
+        self.button_pause = QtWidgets.QPushButton(self.centralwidget)
+        self.button_pause.setGeometry(QtCore.QRect(330, 380, 131, 45))
+        self.button_pause.setFont(small_font)
+        self.button_pause.setObjectName("button_pause")
+        self.button_pause.setText("Пауза")
+        self.button_pause.clicked.connect(self.toggle_pause)
+        self.button_pause.setEnabled(False)  # Until something plays
+
+        self.button_stop = QtWidgets.QPushButton(self.centralwidget)
+        self.button_stop.setGeometry(QtCore.QRect(330, 436, 131, 45))
+        self.button_stop.setFont(small_font)
+        self.button_stop.setObjectName("button_stop")
+        self.button_stop.setText("Стоп")
+        self.button_stop.clicked.connect(self.playback.stop)
+        self.button_stop.setEnabled(False)
+
+        self.playback.progress.connect(self.show_progress)
+        self.playback.state_changed.connect(self.on_playback_state)
 
     def retranslate_ui(self, MainWindow):
         _translate = QtCore.QCoreApplication.translate
@@ -200,48 +264,48 @@ class UiMainWindow(object):
         self.button_voice_over.setText(_translate("MainWindow", "Озвучить"))
         self.button_download.setText(_translate("MainWindow", "Скачать"))
 
+    def current_speaker(self):
+        speaker_label = self.combo_box_female_male_voice.currentText()
+        return speaker_label.split()[1]
+
     def produce_audio(self):
+        """Synthesize the whole text, sentence by sentence"""
         text = self.plain_text.toPlainText()
-        speaker_label = self.combo_box_female_male_voice.currentText()
-        speaker = speaker_label.split()[1]
+        speaker = self.current_speaker()
         print("in generation", text, speaker)
-        put_accent = True
-        put_yo = True
-        
-        # Generate audio
-        audio = self.model.apply_tts(
-            text=text,
-            speaker=speaker,
-            sample_rate=self.sample_rate,
-            put_accent=put_accent,
-            put_yo=put_yo
-        )
-        
-        # Normalize audio to prevent distortion
-        audio = audio / torch.abs(audio).max()
-        # Scale to 16-bit range
-        audio = (audio * 32767).clamp(-32768, 32767)
-        
-        return audio
+        return self.synthesizer.produce(text, speaker)
 
     def generate_voice(self):
-        """Generate and play voice for current text"""
+        """Play voice for current text, starting as soon as the first sentence is synthesized"""
         text = self.plain_text.toPlainText()
         
         # Update user memory before generating voice
-        self.word_suggester.user_memory.update_from_text(text)
-        
-        # Generate audio
-        audio = self.produce_audio()
-        
-        # Convert to numpy array and ensure proper 16-bit PCM format
-        audio_data = audio.detach().cpu().numpy()
-        audio_data = audio_data.astype(np.int16)
+        if self.word_suggester is not None:
+            self.word_suggester.learn_from_text(text)
         
-        # Play the properly formatted audio
-        sou_voi.play(audio_data, self.sample_rate, blocking=False)
-        time.sleep(len(audio_data) / self.sample_rate + 0.3)
-        sou_voi.stop()
+        # Chunks are synthesized on the player's worker thread while earlier ones play,
+        # text voiced during playback is queued after it
+        self.playback.enqueue(self.synthesizer.stream(text, self.current_speaker()))
+
+    def toggle_pause(self):
+        if self.playback.state == 'paused':
+            self.playback.resume()
+        else:
+            self.playback.pause()
+
+    def on_playback_state(self, state):
+        self.button_pause.setEnabled(state != 'stopped')
+        self.button_stop.setEnabled(state != 'stopped')
+        self.button_pause.setText("Продолжить" if state == 'paused' else "Пауза")
+        if state == 'stopped':
+            self.statusBar.clearMessage()
+
+    def show_progress(self, utterance, seconds):
+        queued = len(self.playback.pending)
+        message = f"Воспроизведение: {seconds:.1f} с"
+        if queued:
+            message += f" (в очереди: {queued})"
+        self.statusBar.showMessage(message)
 
     def get_downloads_dir(self):
         """Get or create downloads directory for audio files"""
@@ -277,35 +341,53 @@ class UiMainWindow(object):
             
             # Get downloads directory and create full file path
             downloads_dir = self.get_downloads_dir()
-            filepath = os.path.join(downloads_dir, f"{clean_text}_{timestamp}.mp3")
-            
-            # Generate and process audio
-            audio_data = self.produce_audio().detach().cpu().numpy()
-            
-            # Convert to 16-bit PCM
-            audio_data = audio_data.astype(np.int16)
-            
-            audio = AudioSegment(
-                audio_data.tobytes(),
-                frame_rate=self.sample_rate,
-                sample_width=2,  # Explicitly set to 16-bit
-                channels=1
-            )
-            
-            # Export with higher quality settings
-            audio.export(
-                filepath,
-                format="mp3",
-                bitrate="192k",
-                parameters=["-q:a", "0"]  # Use highest quality setting
-            )
-            
-            print(f"Saved audio as: {filepath}")
+            filepath = os.path.join(downloads_dir, f"{clean_text}_{timestamp}.{DOWNLOAD_FORMAT}")
             
         except Exception as e:
             print(f"Error downloading audio: {e}")
             import traceback
             traceback.print_exc()
+            return
+
+        # Synthesis and encoding run on a worker thread, the window stays responsive
+        speaker = self.current_speaker()
+        self.button_download.setEnabled(False)
+        self.statusBar.showMessage("Сохранение...")
+        self.start_loader(lambda: self.save_audio_file(filepath, text, speaker),
+                          self.on_download_saved, self.on_download_failed)
+
+    def save_audio_file(self, filepath, text, speaker):
+        """Synthesize text into filepath, encoding each sentence as soon as it is synthesized"""
+        with tracing.span('download', chars=len(text), format=DOWNLOAD_FORMAT):
+            with AudioWriter(filepath, self.sample_rate, DOWNLOAD_FORMAT) as writer:
+                for audio in self.synthesizer.stream(text, speaker):
+                    writer.write(audio)
+        return filepath
+
+    def on_download_saved(self, filepath):
+        print(f"Saved audio as: {filepath}")
+        self.statusBar.showMessage(f"Сохранено: {os.path.basename(filepath)}", 5000)
+        self.button_download.setEnabled(True)
+
+    def on_download_failed(self, message):
+        self.statusBar.showMessage(f"Ошибка сохранения: {message}")
+        self.button_download.setEnabled(True)
+
+    def show_stats(self, parent):
+        """Open the tracing stats window"""
+        if self.stats_dialog is None:
+            self.stats_dialog = StatsDialog(self.cache_info, parent)
+        self.stats_dialog.refresh()
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+
+    def cache_info(self):
+        info = {}
+        if self.synthesizer is not None and self.synthesizer.cache is not None:
+            info['synthesis_cache'] = self.synthesizer.cache.info()
+        if self.word_suggester is not None:
+            info['suggestion_cache'] = self.word_suggester.cache.info()
+        return info
 
     def diagnoze_audio(self, audio_data):
         print("Shape", audio_data.shape)
@@ -316,14 +398,43 @@ class UiMainWindow(object):
         else:
             print("Unexpected", audio_data.ndim)
 
-        print("Audio data type", audio_data.dtype, "min value", np.min(audio_data))
+        print("Audio data type", audio_data.dtype, "min value", audio_data.min())
         print("Sample width in bytes", audio_data.dtype.itemsize)
 
     def update_suggestions(self):
-        """Update suggestion buttons based on current text"""
-        text = self.plain_text.toPlainText()
-        suggestions = self.word_suggester.get_suggestions(text, 5)
-        
+        """Request suggestions for the word at the cursor from the worker"""
+        if self.word_suggester is None:
+            return  # Suggestions start once the n-gram data is loaded
+        self.suggestion_request += 1
+        self.suggestion_worker.request(self.suggestion_request, self.text_before_cursor())
+
+    def text_before_cursor(self):
+        """Get up to CONTEXT_CHARS of the current paragraph before the cursor.
+
+        The end of the previous paragraph is added when the cursor is in its
+        first word, so the previous word is still known. Neither the document
+        nor a whole paragraph is copied.
+        """
+        cursor = self.plain_text.textCursor()
+        block = cursor.block()
+        text = self.block_text(cursor.position() - block.position(), block)
+        previous = block.previous()
+        if len(text) == cursor.position() - block.position() and not has_previous_word(text) and previous.isValid():
+            text = self.block_text(previous.length() - 1, previous) + '\n' + text
+        return text
+
+    def block_text(self, end, block):
+        """Get up to CONTEXT_CHARS of block's text before position end in it"""
+        cursor = QtGui.QTextCursor(self.plain_text.document())
+        cursor.setPosition(block.position() + max(0, end - CONTEXT_CHARS))
+        cursor.setPosition(block.position() + end, QtGui.QTextCursor.KeepAnchor)
+        return cursor.selectedText()
+
+    def show_suggestions(self, request_id, suggestions):
+        """Update suggestion buttons with the worker's result"""
+        if request_id != self.suggestion_request:
+            return  # The text changed since this request was made
+
         # Update button texts
         for i, btn in enumerate(self.suggestion_buttons):
             if i < len(suggestions):
@@ -332,31 +443,42 @@ class UiMainWindow(object):
                 btn.setText("")
 
     def use_suggestion(self, word):
-        """Insert the suggested word into text"""
+        """Insert the suggested word in place of the word at the cursor"""
         if not word:  # Don't do anything if button is empty
             return
-        
-        text = self.plain_text.toPlainText()
-        words = text.split()
-        if words:
-            words[-1] = word
-        new_text = ' '.join(words) + ' '  # Add space after the word
-        
-        # Save current cursor
+
         cursor = self.plain_text.textCursor()
-        
-        # Update text
-        self.plain_text.setPlainText(new_text)
-        
-        # Move cursor to end
-        cursor.movePosition(QtGui.QTextCursor.End)
+        block_text = cursor.block().text()
+        block_start = cursor.block().position()
+        position = cursor.positionInBlock()
+
+        # Find the word at the cursor, keeping punctuation in front of it
+        start = position
+        while start > 0 and not block_text[start - 1].isspace():
+            start -= 1
+        while start < position and block_text[start] in PUNCTUATION:
+            start += 1
+        end = position
+        while start < end < len(block_text) and not block_text[end].isspace():
+            end += 1
+
+        if start < position and block_text[position - 1] in PUNCTUATION:
+            # The word before the cursor is completed, add the next one
+            cursor.insertText(' ' + word + ' ')
+        else:
+            cursor.setPosition(block_start + start)
+            cursor.setPosition(block_start + end, QtGui.QTextCursor.KeepAnchor)
+            cursor.insertText(word + ' ')  # Add space after the word
         self.plain_text.setTextCursor(cursor)
-        
+
         # Set focus back to text input
         self.plain_text.setFocus()
 
 if __name__ == "__main__":
+    # Synthesis workers of a bundled app start by running this executable
+    multiprocessing.freeze_support()
     setup_env()
+    tracing.enable_from_env()
     
     # Force the usage of a specific Qt platform
     if sys.platform == 'darwin':
@@ -366,5 +488,6 @@ if __name__ == "__main__":
     MainWindow = QtWidgets.QMainWindow()
     ui = UiMainWindow()
     ui.setup_ui(MainWindow)
+    app.aboutToQuit.connect(ui.shutdown)
     MainWindow.show()
     sys.exit(app.exec_())
@@ -0,0 +1,188 @@
+"""Timing spans and counters for diagnosing slow loads, suggestions and synthesis.
+
+Tracing is off unless enable() is called, or SYNTHESIZER_TRACE is set for
+an entry point that calls enable_from_env(): "1" enables it, a file path
+also writes a Chrome trace there at exit. While it is off, span() returns
+a shared no-op context manager and count() returns right away.
+
+    with tracing.span('suggest'):
+        ...
+    tracing.count('suggest.cache_hit')
+"""
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+TRACE_ENV = 'SYNTHESIZER_TRACE'
+
+tracer = None  # the active Tracer, None while tracing is off
+_NO_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    """Records timing spans and counters from any thread.
+
+    The last max_events spans are kept for the Chrome trace, and every
+    span is added to per-name totals for the stats view.
+    """
+
+    def __init__(self, max_events: int = 100000):
+        self.events = deque(maxlen=max_events)  # (name, start, duration, pid, thread id, args)
+        self.totals = {}  # name -> [count, total seconds, max seconds]
+        self.counters = {}
+        self.thread_names = {}  # (pid, thread id) -> name
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **args):
+        return _Span(self, name, args)
+
+    def add(self, name: str, start: float, duration: float, args: dict = None, pid: int = None, tid: int = None):
+        """Record a span that started at time.perf_counter() start"""
+        if tid is None:
+            tid = threading.get_native_id()
+            if (self.pid, tid) not in self.thread_names:
+                self.thread_names[self.pid, tid] = threading.current_thread().name
+        with self._lock:
+            self.events.append((name, start, duration, pid or self.pid, tid, args))
+            total = self.totals.get(name)
+            if total is None:
+                self.totals[name] = [1, duration, duration]
+            else:
+                total[0] += 1
+                total[1] += duration
+                if duration > total[2]:
+                    total[2] = duration
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def drain(self) -> list:
+        """Take the recorded spans, for a worker process to hand them to its parent"""
+        with self._lock:
+            events = list(self.events)
+            self.events.clear()
+        names = {tid: self.thread_names.get((pid, tid)) for _, _, _, pid, tid, _ in events}
+        return [(*event, names[event[4]]) for event in events]
+
+    def merge(self, events: list):
+        """Add spans drained from another process; perf_counter times are system-wide"""
+        for name, start, duration, pid, tid, args, thread_name in events:
+            self.thread_names.setdefault((pid, tid), thread_name)
+            self.add(name, start, duration, args, pid, tid)
+
+    def stats(self) -> dict:
+        with self._lock:
+            spans = {
+                name: {
+                    'count': count,
+                    'total_ms': round(total * 1e3, 3),
+                    'mean_ms': round(total / count * 1e3, 3),
+                    'max_ms': round(longest * 1e3, 3),
+                }
+                for name, (count, total, longest) in self.totals.items()
+            }
+            return {'spans': spans, 'counters': dict(self.counters)}
+
+    def reset(self):
+        with self._lock:
+            self.events.clear()
+            self.totals.clear()
+            self.counters.clear()
+
+    def export(self, path: str):
+        """Write the spans as a Chrome trace, for chrome://tracing or ui.perfetto.dev, with the stats"""
+        with self._lock:
+            events = list(self.events)
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for (pid, tid), name in list(self.thread_names.items())]
+        for name, start, duration, pid, tid, args in events:
+            trace.append({
+                'name': name,
+                'ph': 'X',
+                'ts': round((start - self.origin) * 1e6, 1),
+                'dur': round(duration * 1e6, 1),
+                'pid': pid,
+                'tid': tid,
+                'args': args or {},
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms', 'otherData': self.stats()}, f,
+                      ensure_ascii=False)
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer: Tracer, name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.add(self.name, self.start, time.perf_counter() - self.start, self.args)
+
+
+def enable(max_events: int = 100000) -> Tracer:
+    """Start tracing, keeping what was recorded if it is on already"""
+    global tracer
+    if tracer is None:
+        tracer = Tracer(max_events)
+    return tracer
+
+
+def disable():
+    global tracer
+    tracer = None
+
+
+def is_enabled() -> bool:
+    return tracer is not None
+
+
+def span(name: str, **args):
+    """Time a with block as a span named name"""
+    current = tracer  # read once, disable() can run on another thread meanwhile
+    if current is None:
+        return _NO_SPAN
+    return current.span(name, **args)
+
+
+def add(name: str, start: float, duration: float, **args):
+    """Record a span measured by the caller, such as one that ends on another thread"""
+    current = tracer
+    if current is not None:
+        current.add(name, start, duration, args)
+
+
+def count(name: str, value: int = 1):
+    current = tracer
+    if current is not None:
+        current.count(name, value)
+
+
+def enable_from_env():
+    """Enable tracing if SYNTHESIZER_TRACE is set, exporting to it at exit if it is a path"""
+    value = os.environ.get(TRACE_ENV)
+    if not value or value == '0':
+        return
+    enable()
+    if value != '1':
+        atexit.register(_export_at_exit, value)
+
+
+def _export_at_exit(path: str):
+    current = tracer
+    if current is not None:
+        current.export(path)
+        print(f"Trace written to {path}")
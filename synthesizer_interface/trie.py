@@ -1,34 +1,83 @@
+from array import array
+
+
 class TrieNode:
+    __slots__ = ('children', 'frequency', 'is_end', 'word', 'top')
+
     def __init__(self):
         self.children = {}  # char -> TrieNode
         self.frequency = 0  # Frequency if this node represents end of word
         self.is_end = False
         self.word = None  # Store complete word at leaf nodes
+        self.top = []  # Word-end nodes of the subtree, most frequent first
 
 class Trie:
-    def __init__(self):
+    DEFAULT_TOP_K = 10
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K):
         self.root = TrieNode()
-    
+        self.top_k = top_k
+
     def insert(self, word: str, frequency: int):
         node = self.root
+        path = [node]
         for char in word.lower():
             if char not in node.children:
                 node.children[char] = TrieNode()
             node = node.children[char]
+            path.append(node)
+        is_new = not node.is_end
         node.is_end = True
         node.frequency = frequency
         node.word = word  # Store original word (preserving case)
-    
+
+        # Refresh the top-k lists from the word's node up to the root
+        for path_node in reversed(path):
+            if not self._update_top(path_node, node) and is_new:
+                # A new word that misses this top-k cannot reach the
+                # top-k of any ancestor either
+                break
+
+    def _update_top(self, node: TrieNode, end_node: TrieNode) -> bool:
+        """Reposition end_node in node's top-k list, return True if it is listed"""
+        top = node.top
+        was_full = len(top) >= self.top_k
+        if end_node in top:
+            top.remove(end_node)
+            if was_full and top and top[-1].frequency > end_node.frequency:
+                # The frequency dropped below the rest of a full list, so a
+                # word outside of it may now belong there
+                self._rebuild_top(node)
+                return end_node in top
+        elif was_full and top[-1].frequency >= end_node.frequency:
+            return False
+
+        # Equal frequencies keep their arrival order
+        index = len(top)
+        while index > 0 and top[index - 1].frequency < end_node.frequency:
+            index -= 1
+        top.insert(index, end_node)
+        del top[self.top_k:]
+        return True
+
+    def _rebuild_top(self, node: TrieNode):
+        """Recompute node's top-k list from its own word and its children's lists"""
+        candidates = [node] if node.is_end else []
+        for child in node.children.values():
+            candidates.extend(child.top)
+        candidates.sort(key=lambda n: n.frequency, reverse=True)
+        node.top = candidates[:self.top_k]
+
     def _collect_words_with_prefix(self, node: TrieNode, prefix: str, words_freq: list):
         """Helper function to collect all words with exact prefix match"""
         # If we're at a word end and it matches our prefix
         if node.is_end and node.word.lower().startswith(prefix.lower()):
             words_freq.append((node.word, node.frequency))
-        
+
         # Continue searching in children
         for child in node.children.values():
             self._collect_words_with_prefix(child, prefix, words_freq)
-    
+
     def get_top_n_prefixed(self, prefix: str, n: int) -> list:
         """Get top n words by frequency that start with prefix"""
         # Find the node corresponding to prefix
@@ -38,19 +87,236 @@ class Trie:
             if char not in node.children:
                 return []  # Prefix not found
             node = node.children[char]
-        
+
+        # The cached top-k list answers any request that fits into it
+        if n <= self.top_k:
+            return [end_node.word for end_node in node.top[:n]]
+
         # Collect all words under this node with their frequencies
         words_freq = []
         self._collect_words(node, words_freq)
-        
+
         # Sort by frequency and return top n words
         words_freq.sort(key=lambda x: x[1], reverse=True)
         return [word for word, _ in words_freq[:n]]
-    
+
     def _collect_words(self, node: TrieNode, words_freq: list):
         """Helper function to collect all words under a node"""
         if node.is_end:
             words_freq.append((node.word, node.frequency))
-        
+
         for child in node.children.values():
-            self._collect_words(child, words_freq) 
\ No newline at end of file
+            self._collect_words(child, words_freq)
+
+    def get_frequency(self, word: str) -> int:
+        """Get frequency of a word, 0 if it is not in the trie"""
+        node = self.root
+        for char in word.lower():
+            if char not in node.children:
+                return 0
+            node = node.children[char]
+        return node.frequency if node.is_end else 0
+
+    def items(self, prefix: str = ''):
+        """Yield (word, frequency) for every word that starts with prefix"""
+        node = self.root
+        for char in prefix.lower():
+            if char not in node.children:
+                return
+            node = node.children[char]
+
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.is_end:
+                yield node.word, node.frequency
+            stack.extend(node.children.values())
+
+
+class CompactTrie:
+    """Trie with the same API as Trie, stored in flat arrays instead of node objects.
+
+    Node i is described by first_child[i], next_sibling[i], char[i] and
+    word_id[i]; siblings are kept sorted by character. Words are interned
+    as UTF-8 into one byte pool and addressed by id, so a node costs a few
+    machine words instead of an object with its own dict.
+    """
+    DEFAULT_TOP_K = Trie.DEFAULT_TOP_K
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K):
+        self.top_k = top_k
+        # Node arrays, node 0 is the root
+        self._first_child = array('i', [-1])
+        self._next_sibling = array('i', [-1])
+        self._char = array('I', [0])
+        self._word_id = array('i', [-1])
+        self._empty_top = array('i', [-1]) * top_k
+        self._top = array('i', self._empty_top)  # top_k word ids per node, -1 padded
+        # Word arrays
+        self._pool = bytearray()
+        self._word_start = array('I')
+        self._word_length = array('I')
+        self._frequency = array('q')
+
+    def _new_node(self, char: int) -> int:
+        self._first_child.append(-1)
+        self._next_sibling.append(-1)
+        self._char.append(char)
+        self._word_id.append(-1)
+        self._top.extend(self._empty_top)
+        return len(self._char) - 1
+
+    def _intern(self, word: str) -> int:
+        encoded = word.encode('utf-8')
+        self._word_start.append(len(self._pool))
+        self._word_length.append(len(encoded))
+        self._pool += encoded
+        self._frequency.append(0)
+        return len(self._frequency) - 1
+
+    def _word(self, word_id: int) -> str:
+        start = self._word_start[word_id]
+        return self._pool[start:start + self._word_length[word_id]].decode('utf-8')
+
+    def _child(self, node: int, char: int) -> int:
+        child = self._first_child[node]
+        while child != -1 and self._char[child] < char:
+            child = self._next_sibling[child]
+        if child != -1 and self._char[child] == char:
+            return child
+        return -1
+
+    def _find(self, prefix: str) -> int:
+        node = 0
+        for char in prefix.lower():
+            node = self._child(node, ord(char))
+            if node == -1:
+                return -1
+        return node
+
+    def _children(self, node: int):
+        child = self._first_child[node]
+        while child != -1:
+            yield child
+            child = self._next_sibling[child]
+
+    def _get_top(self, node: int) -> list:
+        base = node * self.top_k
+        top = self._top[base:base + self.top_k].tolist()
+        if top[-1] == -1:
+            del top[top.index(-1):]
+        return top
+
+    def _set_top(self, node: int, top: list):
+        base = node * self.top_k
+        self._top[base:base + self.top_k] = array('i', top + [-1] * (self.top_k - len(top)))
+
+    def insert(self, word: str, frequency: int):
+        node = 0
+        path = [node]
+        for char in word.lower():
+            char = ord(char)
+            prev, child = -1, self._first_child[node]
+            while child != -1 and self._char[child] < char:
+                prev, child = child, self._next_sibling[child]
+            if child == -1 or self._char[child] != char:
+                new_node = self._new_node(char)
+                self._next_sibling[new_node] = child
+                if prev == -1:
+                    self._first_child[node] = new_node
+                else:
+                    self._next_sibling[prev] = new_node
+                child = new_node
+            node = child
+            path.append(node)
+
+        word_id = self._word_id[node]
+        is_new = word_id == -1
+        if is_new:
+            word_id = self._intern(word)
+            self._word_id[node] = word_id
+        elif self._word(word_id) != word:
+            # Store original word (preserving case), the old bytes stay unused
+            encoded = word.encode('utf-8')
+            self._word_start[word_id] = len(self._pool)
+            self._word_length[word_id] = len(encoded)
+            self._pool += encoded
+        self._frequency[word_id] = frequency
+
+        # Refresh the top-k lists from the word's node up to the root
+        for path_node in reversed(path):
+            if not self._update_top(path_node, word_id, is_new) and is_new:
+                break
+
+    def _update_top(self, node: int, word_id: int, is_new: bool = False) -> bool:
+        """Reposition word_id in node's top-k list, return True if it is listed"""
+        frequency = self._frequency
+        if is_new:
+            # Cheap rejection without unpacking the list
+            last = self._top[node * self.top_k + self.top_k - 1]
+            if last != -1 and frequency[last] >= frequency[word_id]:
+                return False
+        top = self._get_top(node)
+        was_full = len(top) >= self.top_k
+        if word_id in top:
+            top.remove(word_id)
+            if was_full and top and frequency[top[-1]] > frequency[word_id]:
+                self._rebuild_top(node)
+                return word_id in self._get_top(node)
+        elif was_full and frequency[top[-1]] >= frequency[word_id]:
+            return False
+
+        index = len(top)
+        while index > 0 and frequency[top[index - 1]] < frequency[word_id]:
+            index -= 1
+        top.insert(index, word_id)
+        self._set_top(node, top[:self.top_k])
+        return True
+
+    def _rebuild_top(self, node: int):
+        """Recompute node's top-k list from its own word and its children's lists"""
+        own = self._word_id[node]
+        candidates = [own] if own != -1 else []
+        for child in self._children(node):
+            candidates.extend(self._get_top(child))
+        candidates.sort(key=self._frequency.__getitem__, reverse=True)
+        self._set_top(node, candidates[:self.top_k])
+
+    def get_top_n_prefixed(self, prefix: str, n: int) -> list:
+        """Get top n words by frequency that start with prefix"""
+        node = self._find(prefix)
+        if node == -1:
+            return []
+        if n <= self.top_k:
+            return [self._word(word_id) for word_id in self._get_top(node)[:n]]
+
+        words_freq = list(self.items(prefix))
+        words_freq.sort(key=lambda x: x[1], reverse=True)
+        return [word for word, _ in words_freq[:n]]
+
+    def get_frequency(self, word: str) -> int:
+        """Get frequency of a word, 0 if it is not in the trie"""
+        node = self._find(word)
+        if node == -1 or self._word_id[node] == -1:
+            return 0
+        return self._frequency[self._word_id[node]]
+
+    def items(self, prefix: str = ''):
+        """Yield (word, frequency) for every word that starts with prefix"""
+        node = self._find(prefix)
+        if node == -1:
+            return
+
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            word_id = self._word_id[node]
+            if word_id != -1:
+                yield self._word(word_id), self._frequency[word_id]
+            stack.extend(self._children(node))
+
+
+TRIE_ENGINES = {
+    'python': Trie,
+    'compact': CompactTrie,
+}
@@ -1,14 +1,53 @@
 import os
 import json
+from collections import Counter
 import sys
-from synthesizer_interface.trie import Trie
+import threading
+import time
+from synthesizer_interface import tracing
+from synthesizer_interface.bigram_store import BigramStore
+from synthesizer_interface.trie import TRIE_ENGINES
 
 class UserMemory:
-    def __init__(self, memory_file='user_memory.json'):
+    """User word frequencies, persisted as a JSON snapshot plus an append-only journal.
+
+    update_from_text appends only the changed counts to the journal, so a
+    save costs the same however long the history is. Journal entries hold
+    absolute counts, so replaying one twice is harmless. Once the journal
+    grows past compact_after entries, a background thread writes a fresh
+    snapshot and drops the journal.
+
+    Counts live in hash tables keyed by the lowercase word, so an increment
+    is a dict update plus the trie's top-k refresh along one path.
+    """
+
+    def __init__(self, memory_file='user_memory.json', trie_engine='python',
+                 fsync_batch=8, fsync_interval=2.0, compact_after=256):
         self.memory_file = self._get_memory_file_path(memory_file)
-        self.unigram_trie = Trie()
-        self.bigram_tries = {}
+        self.journal_file = self.memory_file + '.journal'
+        # Journal rotated out by a compaction that has not finished yet
+        self.compacting_file = self.journal_file + '.compacting'
+        self.trie_cls = TRIE_ENGINES[trie_engine]
+        self.unigram_trie = self.trie_cls()
+        self.bigrams = BigramStore()
+        self.unigram_counts = {}  # lowercase word -> count
+        self.bigram_counts = {}  # (lowercase word1, lowercase word2) -> count
+        # lowercase word -> its last written form, as the trie and the bigram store keep it
+        self.unigram_forms = {}
+        self.bigram_forms = {}
         self.frequency_threshold = 6
+        self.listeners = []  # called with (unigrams, bigrams) that update_from_text changed
+
+        self.fsync_batch = fsync_batch  # fsync after this many entries...
+        self.fsync_interval = fsync_interval  # ...or this many seconds, whichever comes first
+        self.compact_after = compact_after
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()  # one snapshot writer at a time
+        self._journal = None
+        self._journal_entries = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._compaction = None
         self.load_memory()
 
     def _get_memory_file_path(self, filename):
@@ -22,79 +61,206 @@ class UserMemory:
         return os.path.join(base_dir, filename)
 
     def load_memory(self):
-        """Load user memory from JSON file"""
+        """Load user memory from the snapshot and replay the journal over it"""
+        # Bigrams are merged into the store's arrays once, at the end
+        self.bigrams.auto_compact = False
         if os.path.exists(self.memory_file):
             try:
                 with open(self.memory_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     # Load unigrams
                     for word, freq in data.get('unigrams', {}).items():
-                        self.unigram_trie.insert(word, freq)
+                        self._set_unigram(word, freq)
                     # Load bigrams
                     for word1, next_words in data.get('bigrams', {}).items():
-                        if word1 not in self.bigram_tries:
-                            self.bigram_tries[word1] = Trie()
                         for word2, freq in next_words.items():
-                            self.bigram_tries[word1].insert(word2, freq)
+                            self._set_bigram(word1, word2, freq)
             except Exception as e:
                 print(f"Error loading user memory: {e}")
 
+        # An interrupted compaction leaves its journal behind, it is older
+        for journal_file in (self.compacting_file, self.journal_file):
+            if os.path.exists(journal_file):
+                self._journal_entries += self._replay_journal(journal_file)
+        self.bigrams.compact()
+        self.bigrams.auto_compact = True
+
+    def _replay_journal(self, journal_file):
+        entries = 0
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash can cut the last entry short
+                    print(f"Skipping broken journal entry in {journal_file}")
+                    continue
+                self._apply(entry)
+                entries += 1
+        return entries
+
+    def _apply(self, entry):
+        for word, freq in entry.get('u', {}).items():
+            self._set_unigram(word, freq)
+        for word1, word2, freq in entry.get('b', []):
+            self._set_bigram(word1, word2, freq)
+
+    def _set_unigram(self, word, freq):
+        self.unigram_counts[word.lower()] = freq
+        self.unigram_forms[word.lower()] = word
+        self.unigram_trie.insert(word, freq)
+
+    def _set_bigram(self, word1, word2, freq):
+        self.bigram_counts[(word1.lower(), word2.lower())] = freq
+        self.bigram_forms[word1.lower()] = word1
+        self.bigram_forms[word2.lower()] = word2
+        self.bigrams.insert(word1, word2, freq)
+
+    def increment(self, word: str, delta: int = 1) -> int:
+        """Add delta to the count of word and return the new count"""
+        with self._lock:
+            freq = self.unigram_counts.get(word.lower(), 0) + delta
+            self._set_unigram(word, freq)
+            return freq
+
+    def increment_bigram(self, word1: str, word2: str, delta: int = 1) -> int:
+        """Add delta to the count of the pair and return the new count"""
+        with self._lock:
+            freq = self.bigram_counts.get((word1.lower(), word2.lower()), 0) + delta
+            self._set_bigram(word1, word2, freq)
+            return freq
+
+    @staticmethod
+    def _collect(unigram_counts, unigram_forms, bigram_counts, bigram_forms):
+        """Convert copies of the counts to the snapshot's dictionary format"""
+        data = {
+            'unigrams': {},
+            'bigrams': {}
+        }
+
+        # Save unigrams
+        for key, freq in unigram_counts.items():
+            data['unigrams'][unigram_forms[key]] = freq
+
+        # Save bigrams
+        for (key1, key2), freq in bigram_counts.items():
+            data['bigrams'].setdefault(bigram_forms[key1], {})[bigram_forms[key2]] = freq
+        return data
+
     def save_memory(self):
-        """Save user memory to JSON file"""
+        """Write a full snapshot to the JSON file and drop the journal"""
         try:
-            # Convert tries to dictionary format
-            data = {
-                'unigrams': {},
-                'bigrams': {}
-            }
-            
-            # Save unigrams
-            words_freq = []
-            self.unigram_trie._collect_words(self.unigram_trie.root, words_freq)
-            for word, freq in words_freq:
-                data['unigrams'][word] = freq
-            
-            # Save bigrams
-            for word1, trie in self.bigram_tries.items():
-                words_freq = []
-                trie._collect_words(trie.root, words_freq)
-                if words_freq:
-                    data['bigrams'][word1] = {w: f for w, f in words_freq}
-            
-            # Save to file
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with tracing.span('user_memory.save'):
+                self.compact()
         except Exception as e:
             print(f"Error saving user memory: {e}")
 
+    def compact(self):
+        """Write a snapshot of the current counts and drop the journal entries it covers"""
+        with self._compact_lock:
+            # Only copies of the dictionaries are made while updates wait, the snapshot is built from them after
+            with self._lock:
+                counts = (dict(self.unigram_counts), dict(self.unigram_forms),
+                          dict(self.bigram_counts), dict(self.bigram_forms))
+                # Entries after this point go to a fresh journal
+                self._close_journal()
+                if os.path.exists(self.journal_file):
+                    if os.path.exists(self.compacting_file):
+                        # Left by an interrupted compaction, keep the entries in order
+                        with open(self.journal_file, 'rb') as src, open(self.compacting_file, 'ab') as dst:
+                            dst.write(src.read())
+                        os.remove(self.journal_file)
+                    else:
+                        os.replace(self.journal_file, self.compacting_file)
+                self._journal_entries = 0
+
+            data = self._collect(*counts)
+            # Crash-safe replace: write a temporary file, flush it to disk, then rename
+            tmp_file = self.memory_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.memory_file)
+            _fsync_dir(os.path.dirname(self.memory_file))
+            if os.path.exists(self.compacting_file):
+                os.remove(self.compacting_file)
+
+    def _compact_in_background(self):
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(target=self.save_memory, name='user-memory-compaction', daemon=True)
+        self._compaction.start()
+
+    def _append_journal(self, changed_unigrams, changed_bigrams):
+        entry = {
+            'u': changed_unigrams,
+            'b': [[word1, word2, freq] for (word1, word2), freq in changed_bigrams.items()],
+        }
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._journal.flush()
+        self._journal_entries += 1
+        self._unsynced += 1
+
+        # fsync in batches, it is the expensive part of a small append
+        now = time.monotonic()
+        if self._unsynced >= self.fsync_batch or now - self._last_sync >= self.fsync_interval:
+            os.fsync(self._journal.fileno())
+            self._unsynced = 0
+            self._last_sync = now
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._journal = None
+            self._unsynced = 0
+
+    def close(self):
+        """Flush the journal to disk and wait for a running compaction"""
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._lock:
+            self._close_journal()
+
     def update_from_text(self, text: str):
         """Update frequencies based on input text"""
         words = text.strip().split()
         if not words:
             return
-            
-        # Update unigram frequencies
-        for word in words:
-            current_freq = 0
-            words_freq = []
-            self.unigram_trie._collect_words_with_prefix(self.unigram_trie.root, word, words_freq)
-            if words_freq:
-                current_freq = words_freq[0][1]
-            self.unigram_trie.insert(word, current_freq + 1)
-            
-        # Update bigram frequencies
-        for i in range(len(words) - 1):
-            word1, word2 = words[i], words[i + 1]
-            if word1 not in self.bigram_tries:
-                self.bigram_tries[word1] = Trie()
-            
-            current_freq = 0
-            words_freq = []
-            self.bigram_tries[word1]._collect_words_with_prefix(
-                self.bigram_tries[word1].root, word2, words_freq)
-            if words_freq:
-                current_freq = words_freq[0][1]
-            self.bigram_tries[word1].insert(word2, current_freq + 1)
-        
-        # Save changes
-        self.save_memory() 
\ No newline at end of file
+
+        with self._lock:
+            # Count repeats within the text first, so each word is stored once
+            changed_unigrams = {}
+            for word, delta in Counter(words).items():
+                changed_unigrams[word] = self.increment(word, delta)
+
+            changed_bigrams = {}
+            for (word1, word2), delta in Counter(zip(words, words[1:])).items():
+                changed_bigrams[(word1, word2)] = self.increment_bigram(word1, word2, delta)
+
+            for listener in self.listeners:
+                listener(changed_unigrams, changed_bigrams)
+
+            # Save changes
+            try:
+                with tracing.span('user_memory.journal'):
+                    self._append_journal(changed_unigrams, changed_bigrams)
+            except Exception as e:
+                print(f"Error saving user memory: {e}")
+            if self._journal_entries >= self.compact_after:
+                self._compact_in_background()
+
+
+def _fsync_dir(path):
+    """Make a rename in path durable, where the platform allows it"""
+    if sys.platform == 'win32':
+        return
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
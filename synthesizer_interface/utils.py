@@ -1,7 +1,8 @@
 import os
 import sys
-import torch
-from pydub import AudioSegment
+
+# torch, pydub and sounddevice take seconds to import between them, modules
+# import them where they are first used so that suggestions start without them
 
 def setup_env():
     # torch.hub logs to sys.stderr while windowed app has sys.stderr = None
@@ -10,12 +11,8 @@ def setup_env():
     if sys.stderr is None:
         sys.stderr = open(os.devnull, "w")
 
-    # Set up torch backend for Mac
-    if sys.platform == 'darwin':
-        import torch
-        torch.backends.quantized.engine = 'qnnpack'
-
     # setup path to ffmpeg util for mp3 generation
+    from pydub import AudioSegment
     if getattr(sys, 'frozen', False):
         if sys.platform == 'win32':
             ffmpeg_path = os.path.join(sys._MEIPASS, "ffmpeg.exe")
@@ -30,8 +27,33 @@ def setup_env():
     if sys.platform == 'darwin':
         os.environ['QT_MAC_WANTS_LAYER'] = '1'
 
+def setup_torch():
+    """Import torch and configure it before a model is loaded, in every process that loads one"""
+    import torch
+    # Set up torch backend for Mac
+    if sys.platform == 'darwin':
+        torch.backends.quantized.engine = 'qnnpack'
+    return torch
+
 def get_data_dir():
     """Get path to data directory"""
     if getattr(sys, 'frozen', False):
         return os.path.join(sys._MEIPASS, 'data')
-    return 'data' 
\ No newline at end of file
+    return 'data' 
+
+def get_model_dir():
+    """Get path to store the model"""
+    if getattr(sys, 'frozen', False):
+        # If running as bundled app, store next to executable
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        # If running from source, store in user's home directory
+        base_dir = os.path.expanduser('~')
+
+    model_dir = os.path.join(base_dir, '.silero_models')
+    os.makedirs(model_dir, exist_ok=True)
+    return model_dir
+
+def get_cache_dir():
+    """Get path to store synthesized audio for reuse"""
+    return os.path.join(get_model_dir(), 'audio_cache')
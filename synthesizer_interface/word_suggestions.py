@@ -1,23 +1,52 @@
+import itertools
 import os
 import re
+import threading
 
-from synthesizer_interface.trie import Trie
+from synthesizer_interface import tracing
+from synthesizer_interface.bigram_store import BigramStore
+from synthesizer_interface.ngram_index import NgramIndex
+from synthesizer_interface.ranking import Ranker, top_stream
+from synthesizer_interface.suggestion_cache import SuggestionCache
+from synthesizer_interface.trie import TRIE_ENGINES
 from synthesizer_interface.utils import get_data_dir
 from synthesizer_interface.user_memory import UserMemory
 
+PUNCTUATION = '.,!?;:"\'()[]'  # characters removed by clean_word
+
 class WordSuggester:
-    def __init__(self):
-        self.unigram_trie = Trie()
-        self.bigram_tries = {}  # word -> Trie
-        self.user_memory = UserMemory()
-        self.load_ngrams()
-
-    def load_ngrams(self):
-        """Load both unigrams and bigrams into tries"""
+    def __init__(self, trie_engine: str = 'python', use_index: bool = True, cache_size: int = 1024,
+                 cache_ttl: float = None, ranker: Ranker = None, memory_file: str = 'user_memory.json'):
+        self.trie_cls = TRIE_ENGINES[trie_engine]
+        self.unigram_trie = self.trie_cls()
+        self.bigrams = BigramStore(auto_compact=False)
+        self.index = None
+        self.user_memory = UserMemory(memory_file, trie_engine=trie_engine)
+        # Suggestions are computed off the GUI thread while learning runs on it
+        self.lock = threading.Lock()
+        self.cache = SuggestionCache(cache_size, cache_ttl)
+        self.ranker = ranker or Ranker()
+        self.user_memory.listeners.append(self._on_memory_update)
+        self.load_ngrams(use_index)
+
+    def load_ngrams(self, use_index: bool = True):
+        """Load unigrams into a trie and bigrams into a bigram store"""
         data_dir = get_data_dir()
-        
-        self._load_unigrams(data_dir)
-        self._load_bigrams(data_dir)
+
+        # The prebuilt index answers the same queries without parsing the TSV files
+        if use_index:
+            with tracing.span('load.index'):
+                self.index = NgramIndex.open(data_dir)
+            if self.index is not None:
+                print(f"Using n-gram index with {self.index.meta['words']} words")
+                self.unigram_trie = self.index.unigrams
+                self.bigrams = self.index.bigrams
+                return
+
+        with tracing.span('load.unigrams'):
+            self._load_unigrams(data_dir)
+        with tracing.span('load.bigrams'):
+            self._load_bigrams(data_dir)
 
     def _load_unigrams(self, data_dir):
         try:
@@ -55,14 +84,13 @@ class WordSuggester:
                         if len(words) == 2:
                             word1, word2 = words
                             freq = int(freq)
-                            if word1 not in self.bigram_tries:
-                                self.bigram_tries[word1] = Trie()
-                            self.bigram_tries[word1].insert(word2, freq)
+                            self.bigrams.insert(word1, word2, freq)
                     except (ValueError, IndexError) as e:
                         cnt -= 1
                         print(f"Skipping malformed line: {line.strip()}")
                         continue
-            print(f"{cnt}, Bigrams loaded into {len(self.bigram_tries)} tries")
+            self.bigrams.compact()
+            print(f"{cnt}, Bigrams loaded into bigram store")
         except Exception as e:
             print(f"Error loading bigrams: {e}")
             import traceback
@@ -76,97 +104,122 @@ class WordSuggester:
         cleaned = cleaned.strip()
         return cleaned
 
-    def get_suggestions(self, text: str, n: int = 5) -> list:
-        """Get word suggestions based on current text"""
-        # Split text into words and clean each word
-        words = [self.clean_word(w) for w in text.strip().split()]
-        # Remove empty strings that might result from cleaning
-        words = [w for w in words if w]
-        
-        if not words:
-            return []
-        
-        # Check if the text ends with a space or punctuation
-        ends_with_space = text.strip()[-1] if text.strip() else ''
-        is_word_completed = ends_with_space in [' ', ',', '.', '!', '?', ';', ':']
-        
+    def learn_from_text(self, text: str):
+        """Update user memory from text, safe to call while suggestions are computed"""
+        with self.lock:
+            self.user_memory.update_from_text(text)
+
+    def get_suggestions(self, text: str, n: int = 5, cursor: int = None) -> list:
+        """Get word suggestions for the word at cursor (end of text by default)"""
+        # The span includes waiting for learning to release the lock
+        with tracing.span('suggest'), self.lock:
+            return self._get_suggestions(text, n, cursor)
+
+    def get_context(self, text: str, cursor: int = None) -> tuple:
+        """Get (previous word, current prefix, is word completed) at cursor.
+
+        Only the current and the previous token before the cursor are read,
+        so the cost does not depend on the length of the text.
+        """
+        end = len(text) if cursor is None else min(max(cursor, 0), len(text))
+        start = end
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+        token = text[start:end]
+
+        # The word is completed after a space or a punctuation mark
+        is_word_completed = not token or token[-1] in PUNCTUATION
+        current = self.clean_word(token)
+        if is_word_completed and current:
+            return current, '', True
+
+        # Find the previous token
+        prev_end = start
+        while prev_end > 0 and text[prev_end - 1].isspace():
+            prev_end -= 1
+        prev_start = prev_end
+        while prev_start > 0 and not text[prev_start - 1].isspace():
+            prev_start -= 1
+        prev_word = self.clean_word(text[prev_start:prev_end])
+
+        if not current:
+            return prev_word, '', True
+        return prev_word, current, False
+
+    def _on_memory_update(self, unigrams: dict, bigrams: dict):
+        """Drop cached suggestions that learned words can change"""
+        # Words below the threshold are never suggested, so only those at or above it matter
+        threshold = self.user_memory.frequency_threshold
+        self.cache.invalidate(
+            [word for word, freq in unigrams.items() if freq >= threshold],
+            [pair for pair, freq in bigrams.items() if freq >= threshold])
+
+    def _get_suggestions(self, text: str, n: int, cursor: int) -> list:
+        prev_word, current_prefix, is_word_completed = self.get_context(text, cursor)
+
+        key = (prev_word, current_prefix, n)
+        suggestions = self.cache.get(key)
+        if suggestions is None:
+            tracing.count('suggest.cache_miss')
+            suggestions = self._compute_suggestions(prev_word, current_prefix, is_word_completed, n)
+            self.cache.put(key, suggestions)
+        else:
+            tracing.count('suggest.cache_hit')
+        return suggestions
+
+    def _compute_suggestions(self, prev_word: str, current_prefix: str, is_word_completed: bool, n: int) -> list:
         if is_word_completed:
             # If word is completed, suggest next words based on the last completed word
-            if words:  # If we have at least one word
+            if prev_word:
                 print("Word completed, suggesting next words based on bigrams")
-                return self.get_bigram_suggestions(words[-1], "", n)
+                return self.get_bigram_suggestions(prev_word, "", n)
             return []
         else:
             # If word is not completed, provide suggestions for current word
-            last_word = words[-1]
-            if len(words) == 1:
+            if not prev_word:
                 print("First word not completed, suggesting next words based on unigrams")
-                return self.get_unigram_suggestions(last_word, n)
+                return self.get_unigram_suggestions(current_prefix, n)
             else:
                 print("Last word not completed, suggesting next words based on bigrams and unigrams")
-                prev_word = words[-2]
-                suggesting_bigram = self.get_bigram_suggestions(prev_word, last_word, n)
-                suggesting_unigram = self.get_unigram_suggestions(last_word, n)
-                # remove duplicates
-                suggesting = list(set(suggesting_bigram + suggesting_unigram))
-                
-                return suggesting
+                sources = self._bigram_sources(prev_word, current_prefix, n) + self._unigram_sources(current_prefix, n)
+                return self.ranker.merge(sources, n)
+
+    def _user_stream(self, stream):
+        """Cut a user memory stream at the first word below the frequency threshold"""
+        threshold = self.user_memory.frequency_threshold
+        return itertools.takewhile(lambda item: item[1] >= threshold, stream)
+
+    def _unigram_sources(self, prefix: str, n: int) -> list:
+        user_trie = self.user_memory.unigram_trie
+        user = top_stream(lambda k: user_trie.get_top_n_prefixed(prefix, k), user_trie.get_frequency, n)
+        main = top_stream(lambda k: self.unigram_trie.get_top_n_prefixed(prefix, k),
+                          self.unigram_trie.get_frequency, n)
+        weight = self.ranker.unigram_weight
+        return [(self._user_stream(user), weight, self.ranker.user_boost), (main, weight, 0.0)]
+
+    def _bigram_sources(self, prev_word: str, prefix: str, n: int) -> list:
+        user_bigrams = self.user_memory.bigrams
+        user = top_stream(lambda k: user_bigrams.top_n(prev_word, prefix, k),
+                          lambda word: user_bigrams.get_frequency(prev_word, word), n)
+        main = top_stream(lambda k: self.bigrams.top_n(prev_word, prefix, k),
+                          lambda word: self.bigrams.get_frequency(prev_word, word), n)
+        weight = self.ranker.bigram_weight
+        return [(self._user_stream(user), weight, self.ranker.user_boost), (main, weight, 0.0)]
 
     def get_unigram_suggestions(self, prefix: str, n: int = 5) -> list:
-        # First check user memory
-        user_suggestions = set()  # Use set to track suggestions
-        if self.user_memory:
-            words_freq = []
-            self.user_memory.unigram_trie._collect_words_with_prefix(
-                self.user_memory.unigram_trie.root, prefix, words_freq)
-            # Add only frequent enough words
-            for word, freq in words_freq:
-                if freq >= self.user_memory.frequency_threshold:
-                    user_suggestions.add(word)
-        print(f"User suggestions: {user_suggestions}")
-        
-        # Then get suggestions from main trie, excluding ones we already have
-        main_suggestions = []
-        if len(user_suggestions) < n:
-            all_main = self.unigram_trie.get_top_n_prefixed(prefix, n)
-            # Only add suggestions we haven't seen yet
-            for word in all_main:
-                if word not in user_suggestions and len(main_suggestions) < (n - len(user_suggestions)):
-                    main_suggestions.append(word)
-        
-        # Combine suggestions, maintaining order (user memory first)
-        return list(user_suggestions) + main_suggestions
+        """Get top n words starting with prefix, frequent user words first"""
+        return self.ranker.merge(self._unigram_sources(prefix, n), n)
 
     def get_bigram_suggestions(self, prev_word: str, current_prefix: str, n: int = 5) -> list:
-        # First check user memory
-        user_suggestions = set()  # Use set to track suggestions
-        if self.user_memory and prev_word in self.user_memory.bigram_tries:
-            words_freq = []
-            self.user_memory.bigram_tries[prev_word]._collect_words_with_prefix(
-                self.user_memory.bigram_tries[prev_word].root, current_prefix, words_freq)
-            # Add only frequent enough words
-            for word, freq in words_freq:
-                if freq >= self.user_memory.frequency_threshold:
-                    user_suggestions.add(word)
-        
-        # Then get suggestions from main tries, excluding ones we already have
-        main_suggestions = []
-        if len(user_suggestions) < n and prev_word in self.bigram_tries:
-            all_main = self.bigram_tries[prev_word].get_top_n_prefixed(current_prefix, n)
-            # Only add suggestions we haven't seen yet
-            for word in all_main:
-                if word not in user_suggestions and len(main_suggestions) < (n - len(user_suggestions)):
-                    main_suggestions.append(word)
-        
-        # Combine suggestions, maintaining order (user memory first)
-        return list(user_suggestions) + main_suggestions 
+        """Get top n words following prev_word that start with current_prefix, frequent user words first"""
+        return self.ranker.merge(self._bigram_sources(prev_word, current_prefix, n), n)
 
 
     # these functions not used in prod, for debugging
     def word_exists(self, word: str) -> bool:
         # Check if a word exists in the unigram trie.
         cleaned_word = self.clean_word(word)
-        return self.unigram_trie.search(cleaned_word) is not None 
+        return self.unigram_trie.get_frequency(cleaned_word) > 0
 
     def get_all_bigrams_for_word(self, word: str) -> list[str]:
         # Returns all bigrams (second words) that follow the given word.
@@ -174,21 +227,14 @@ class WordSuggester:
         bigrams = []
         
         # Check user memory first
-        if self.user_memory and cleaned_word in self.user_memory.bigram_tries:
-            words_freq = []
-            self.user_memory.bigram_tries[cleaned_word]._collect_words_with_prefix(
-                self.user_memory.bigram_tries[cleaned_word].root, "", words_freq)
+        if self.user_memory:
             # Add words that meet frequency threshold
-            bigrams.extend(word for word, freq in words_freq 
+            bigrams.extend(word for word, freq in self.user_memory.bigrams.items(cleaned_word)
                          if freq >= self.user_memory.frequency_threshold)
         
-        # Then check main bigram tries
-        if cleaned_word in self.bigram_tries:
-            words_freq = []
-            self.bigram_tries[cleaned_word]._collect_words_with_prefix(
-                self.bigram_tries[cleaned_word].root, "", words_freq)
-            # Add words not already included from user memory
-            bigrams.extend(word for word, _ in words_freq 
-                         if word not in bigrams)
+        # Then check main bigram store
+        # Add words not already included from user memory
+        bigrams.extend(word for word, _ in self.bigrams.items(cleaned_word)
+                     if word not in bigrams)
         
         return bigrams 
\ No newline at end of file
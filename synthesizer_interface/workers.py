@@ -0,0 +1,61 @@
+from PyQt5 import QtCore
+
+
+class SuggestionWorker(QtCore.QObject):
+    """Computes word suggestions on a background thread.
+
+    Requests carry a sequence number. The worker skips requests that were
+    superseded while queued, and the window drops results whose number is
+    not the latest one.
+    """
+    requested = QtCore.pyqtSignal(int, str)
+    ready = QtCore.pyqtSignal(int, list)
+
+    def __init__(self, word_suggester, n: int = 5):
+        super().__init__()
+        self.word_suggester = word_suggester
+        self.n = n
+        self.latest_request = 0
+        self.requested.connect(self.compute)
+
+    def request(self, request_id: int, text: str):
+        """Queue a request, callable from the GUI thread"""
+        self.latest_request = request_id
+        self.requested.emit(request_id, text)
+
+    @QtCore.pyqtSlot(int, str)
+    def compute(self, request_id: int, text: str):
+        if request_id != self.latest_request:
+            return  # A newer request is already queued behind this one
+        try:
+            suggestions = self.word_suggester.get_suggestions(text, self.n)
+        except Exception as e:
+            print(f"Error getting suggestions: {e}")
+            suggestions = []
+        self.ready.emit(request_id, suggestions)
+
+
+class ResourceLoader(QtCore.QObject):
+    """Builds a slow resource, such as the TTS model, on a background thread.
+
+    Emits loaded with the result, or failed with the error message, and
+    then finished.
+    """
+    loaded = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        try:
+            self.loaded.emit(self.factory())
+        except Exception as e:
+            print(f"Error loading resource: {e}")
+            import traceback
+            traceback.print_exc()
+            self.failed.emit(str(e))
+        self.finished.emit()